@@ -0,0 +1,53 @@
+# Bulk import throughput: loads a synthetic supplier catalog into an empty database,
+# then runs a stock-take over the same items that changes a tenth of the quantities.
+#
+#   python -m benchmarks.bench_bulk_import --rows 100000
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+
+from database.db_handler import DatabaseHandler, PERFORMANCE_PROFILE
+from business.bulk_import import IMPORT_BATCH_SIZE, BulkImporter
+
+
+def write_catalog(path, rows, rng, changed=0.0):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['item_name', 'quantity', 'cost'])
+        for n in range(rows):
+            quantity = 50 + n % 50
+            if rng.random() < changed:
+                quantity = rng.randrange(100)
+            writer.writerow([f"Item {n:06d}", quantity, f"{1 + n % 400 / 100:.2f}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk inventory import throughput")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix='brewbite-import-')
+    catalog = os.path.join(directory, 'catalog.csv')
+    stocktake = os.path.join(directory, 'stocktake.csv')
+    write_catalog(catalog, args.rows, rng)
+    write_catalog(stocktake, args.rows, rng, changed=0.1)
+
+    db = DatabaseHandler(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile=PERFORMANCE_PROFILE)
+    importer = BulkImporter(db, batch_size=args.batch_size)
+    try:
+        for label, path, mode in (('catalog', catalog, 'catalog'), ('stock-take', stocktake, 'stocktake')):
+            report = importer.import_file(path, mode=mode)
+            print(f"{label}:")
+            print("  " + report.summary().replace("\n", "\n  "))
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
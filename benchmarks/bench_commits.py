@@ -0,0 +1,47 @@
+# Compares commits per second with sqlite's default settings against the
+# DatabaseHandler performance profile (WAL, synchronous=NORMAL, ...).
+#
+#   python -m benchmarks.bench_commits --commits 500
+
+import argparse
+import os
+import tempfile
+import time
+
+from database.db_handler import DatabaseHandler, DEFAULT_PROFILE, PERFORMANCE_PROFILE
+from business.inventory_manager import InventoryManager
+
+
+def measure(profile, commits):
+    directory = tempfile.mkdtemp(prefix='brewbite-commits-')
+    db_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+    db = DatabaseHandler(db_url, profile=profile)
+    inventory = InventoryManager(db)
+    item = inventory.add_item('espresso beans', 0, 12.5)
+
+    # every update_quantity call is its own transaction and commit
+    started = time.perf_counter()
+    for quantity in range(commits):
+        inventory.update_quantity(item.item_id, quantity)
+    elapsed = time.perf_counter() - started
+    db.close()
+
+    return commits / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite commit throughput by pragma profile")
+    parser.add_argument('--commits', type=int, default=500)
+    args = parser.parse_args()
+
+    baseline = measure(DEFAULT_PROFILE, args.commits)
+    tuned = measure(PERFORMANCE_PROFILE, args.commits)
+
+    print(f"default pragmas:     {baseline:8.1f} commits/s")
+    print(f"performance profile: {tuned:8.1f} commits/s")
+    print(f"speedup:             {tuned / baseline:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Type-ahead latency of the item name search index on a large synthetic catalog.
+# Every prefix of each query is timed, as if typed one key at a time.
+#
+#   python -m benchmarks.bench_item_search --items 50000
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from business.item_search import ItemSearchIndex
+
+SIZES = ["", "Small", "Regular", "Large"]
+MILKS = ["", "Oat", "Soy", "Almond", "Whole", "Skimmed", "Coconut"]
+DRINKS = ["Flat White", "Latte", "Cappuccino", "Americano", "Mocha", "Cortado", "Chai Latte",
+          "Hot Chocolate", "Espresso", "Macchiato", "Iced Latte", "Matcha Latte"]
+FOODS = ["Croissant", "Pain au Chocolat", "Banana Bread", "Cinnamon Bun", "Toastie", "Bagel",
+         "Brownie", "Flapjack", "Scone", "Muffin", "Cookie", "Panini"]
+FLAVOURS = ["", "Vanilla", "Caramel", "Hazelnut", "Ham and Cheese", "Blueberry", "Chocolate",
+            "Pumpkin Spice", "Salted Caramel", "Gingerbread"]
+
+QUERIES = ["oat flat white", "large oat latte", "caramel", "ham and cheese toastie",
+           "blueberry muffin", "choc", "salted caramel mocha", "flat whte", "cinnamon bun 12"]
+
+TARGET_MS = 5.0
+
+
+def catalog(size, seed):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < size:
+        if rng.random() < 0.6:
+            parts = [rng.choice(SIZES), rng.choice(MILKS), rng.choice(FLAVOURS), rng.choice(DRINKS)]
+        else:
+            parts = [rng.choice(FLAVOURS), rng.choice(FOODS)]
+        # a supplier code keeps names unique like a real catalog
+        parts.append(str(rng.randint(1, 999)))
+        names.add(" ".join(part for part in parts if part))
+    return list(enumerate(sorted(names), start=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Item search type-ahead benchmark")
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    items = catalog(args.items, args.seed)
+    index = ItemSearchIndex()
+    started = time.perf_counter()
+    index.build(items)
+    print(f"indexed {len(index)} items in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    timings = []
+    for query in QUERIES:
+        for length in range(1, len(query) + 1):
+            started = time.perf_counter()
+            index.search(query[:length])
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"keystrokes: {len(timings)}")
+    print(f"p50: {p50:.3f} ms  p99: {p99:.3f} ms  max: {timings[-1]:.3f} ms")
+
+    for query in QUERIES[:3]:
+        names = dict(items)
+        print(f"  {query!r} -> {[names[item_id] for item_id in index.search(query, 3)]}")
+
+    ok = p99 < TARGET_MS
+    print(f"result: {'OK' if ok else 'FAILED'}, p99 target {TARGET_MS} ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Cold start of the desktop app: what importing the main window costs (python -X importtime)
+# and the wall clock from launching the process to the login screen being painted and to
+# the database being open. Needs a display for the second part.
+#
+#   python -m benchmarks.bench_startup --runs 5
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must not be loaded before the login screen is painted
+DEFERRED = ('sqlalchemy', 'database.', 'presentation.inventory_window', 'presentation.sales_window',
+            'presentation.reports_window', 'presentation.users_window')
+
+# exit status of the child below when the database did not open
+STARTUP_FAILED = 3
+
+# run in a child process from the working directory holding cafe.db, prints time.time()
+# once the login screen is painted and again once the database is open. If opening the
+# database fails, the error dialog is replaced by the message on stderr and exit status 3
+FIRST_FRAME = """
+import sys
+import time
+from tkinter import messagebox
+errors = []
+messagebox.showerror = lambda title, message, **options: errors.append(message)
+from presentation.main_window import MainWindow
+app = MainWindow()
+print('frame', time.time(), flush=True)
+while app.user_manager is None and not errors:
+    app.root.update()
+    time.sleep(0.001)
+if not errors:
+    print('ready', time.time(), flush=True)
+app.root.destroy()
+app.jobs.shutdown()
+if errors:
+    print(errors[0], file=sys.stderr)
+    sys.exit(3)
+"""
+
+
+class StartupError(RuntimeError):
+    pass
+
+
+def child_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def import_times():
+    # (total microseconds for the main window module, {module: cumulative microseconds})
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import presentation.main_window'],
+                            capture_output=True, text=True, env=child_env(), check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        modules[name] = int(cumulative)
+    return modules['presentation.main_window'], modules
+
+
+def first_frame(directory):
+    # seconds from launch to the painted login screen and to the open database
+    launched = time.time()
+    result = subprocess.run([sys.executable, '-c', FIRST_FRAME], capture_output=True, text=True,
+                            cwd=directory, env=child_env())
+    if result.returncode:
+        message = (result.stderr.strip() or f"exit status {result.returncode}").splitlines()[-1]
+        raise (StartupError if result.returncode == STARTUP_FAILED else RuntimeError)(message)
+    stamps = dict(line.split() for line in result.stdout.splitlines() if line.startswith(('frame', 'ready')))
+    return float(stamps['frame']) - launched, float(stamps['ready']) - launched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desktop app cold start benchmark")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, modules = import_times()
+        totals.append(total)
+    eager = sorted(name for name in modules if name.startswith(DEFERRED))
+    print(f"import presentation.main_window: median {statistics.median(totals) / 1000:.1f} ms "
+          f"over {args.runs} run(s), {len(modules)} modules")
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:8]
+    for name, cumulative in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    ok = not eager
+    if eager:
+        print(f"loaded before the first frame but should be deferred: {', '.join(eager)}")
+
+    directory = tempfile.mkdtemp(prefix='brewbite-startup-')
+    try:
+        # the first launch creates cafe.db, the others open a database at the current schema version
+        frames, ready = [], []
+        for run in range(args.runs + 1):
+            frame, opened = first_frame(directory)
+            if run == 0:
+                print(f"new database:    first frame {frame * 1000:.0f} ms, database open {opened * 1000:.0f} ms")
+                continue
+            frames.append(frame)
+            ready.append(opened)
+        print(f"existing database: first frame median {statistics.median(frames) * 1000:.0f} ms, "
+              f"database open median {statistics.median(ready) * 1000:.0f} ms")
+    except StartupError as e:
+        print(f"startup failed: {e}")
+        ok = False
+    except RuntimeError as e:
+        print(f"first frame not measured: {e}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"result: {'OK' if ok else 'FAILED'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+# Benchmark suite for the business layer on a seeded synthetic database. Results are
+# written as JSON and compared against a stored baseline, a case whose median got
+# slower by more than --tolerance fails the run.
+#
+#   python -m benchmarks.bench_suite --sales 200000 --output results.json
+#   python -m benchmarks.bench_suite --save-baseline      # after an intended change
+#
+# The generated database is cached in the temp directory per scale and seed, every
+# run works on a fresh copy of it.
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from database.db_handler import DatabaseHandler
+from business.inventory_manager import InventoryManager
+from business.password_hasher import PasswordHasher
+from business.report_engine import ReportEngine
+from business.report_formatter import ReportFormatter
+from business.sales_manager import SalesManager
+from business.user_manager import UserManager
+from benchmarks.synthetic_data import PASSWORD, SyntheticData
+
+# machine specific, so it is ignored by git rather than committed
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# a case fails when its median is this much slower than the baseline
+TOLERANCE = 0.4
+
+# medians under this (seconds) are too noisy to compare
+NOISE_FLOOR = 0.0002
+
+
+def percentile(timings, q):
+    # timings must be sorted
+    return timings[min(len(timings) - 1, int(len(timings) * q))]
+
+
+class Suite:
+    """
+    The benchmark cases, each a setup function returning the callable to time.
+    Checkouts and stock edits change the copy of the database they run on.
+    """
+
+    def __init__(self, db, data, seed):
+        self.db = db
+        self.data = data
+        self.rng = random.Random(seed)
+        self.cases = {
+            'create_sale': (self.create_sale, 500),
+            'update_quantity': (self.update_quantity, 500),
+            'verify_user': (self.verify_user, 20),
+            'get_all_items': (self.get_all_items, 20),
+            'get_all_items.cached': (self.get_all_items_cached, 200),
+        }
+        for report in ReportFormatter(ReportEngine(db)).report_types():
+            self.cases['report.' + report.lower().replace(' ', '_')] = (lambda report=report: self.report(report), 15)
+
+    def item_id(self):
+        return self.rng.randint(1, self.data.items)
+
+    def create_sale(self):
+        inventory = InventoryManager(self.db)
+        sales = SalesManager(self.db, inventory_cache=inventory.cache)
+        return lambda: sales.create_sale(self.rng.randint(1, self.data.users),
+                                         [(self.item_id(), 1) for _ in range(self.rng.randint(1, 4))])
+
+    def update_quantity(self):
+        inventory = InventoryManager(self.db)
+        return lambda: inventory.update_quantity(self.item_id(), self.rng.randint(100, 1000))
+
+    def verify_user(self):
+        # without the verified cache, this is what the first login of a shift costs
+        users = UserManager(self.db, hasher=PasswordHasher(cache_size=0))
+        return lambda: users.verify_user(f"user{self.rng.randint(1, self.data.users)}", PASSWORD)
+
+    def get_all_items(self):
+        # a new manager has an empty cache, so every call loads the catalog
+        return lambda: InventoryManager(self.db).get_all_items()
+
+    def get_all_items_cached(self):
+        inventory = InventoryManager(self.db)
+        inventory.get_all_items()
+        return inventory.get_all_items
+
+    def report(self, report_type):
+        formatter = ReportFormatter(ReportEngine(self.db))
+        return lambda: sum(1 for _ in formatter.lines(report_type))
+
+    def run(self, names=None, repeat_scale=1.0):
+        results = {}
+        for name, (setup, repeat) in self.cases.items():
+            if names and name not in names:
+                continue
+            fn = setup()
+            fn()  # warm up caches and compiled statements
+            timings = []
+            for _ in range(max(1, round(repeat * repeat_scale))):
+                started = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            results[name] = {
+                'runs': len(timings),
+                'mean': sum(timings) / len(timings),
+                'p50': percentile(timings, 0.5),
+                'p95': percentile(timings, 0.95),
+                'p99': percentile(timings, 0.99),
+                'max': timings[-1],
+            }
+        return results
+
+
+def prepare(data, directory):
+    # returns a fresh working copy of the generated database, generating it on first use
+    scale = data.describe()
+    cached = os.path.join(tempfile.gettempdir(), "brewbite-bench-{items}-{users}-{sales}-{days}-{end}-{seed}.db"
+                          .format(**scale))
+    if not os.path.exists(cached):
+        print(f"generating {cached} ...", file=sys.stderr)
+        partial = cached + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        data.build(f"sqlite:///{partial}")
+        os.replace(partial, cached)
+
+    path = os.path.join(directory, 'bench.db')
+    shutil.copyfile(cached, path)
+    return path
+
+
+def compare(results, baseline, tolerance):
+    # (name, baseline p50, current p50, change) for every case in both, and the regressions
+    rows, regressions = [], []
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            rows.append((name, None, current['p50'], None))
+            continue
+        change = current['p50'] / before['p50'] - 1 if before['p50'] else 0.0
+        rows.append((name, before['p50'], current['p50'], change))
+        if change > tolerance and current['p50'] - before['p50'] > NOISE_FLOOR:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Business layer benchmark suite")
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--sales', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--case', action='append', help="run only this case, can be repeated")
+    parser.add_argument('--repeat-scale', type=float, default=1.0, help="multiplies every case's run count")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline to compare against (default: %(default)s)")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed median slowdown as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    # sales run up to today so the daily and monthly reports always have rows to show
+    data = SyntheticData(args.items, args.users, args.sales, args.days, seed=args.seed)
+    directory = tempfile.mkdtemp(prefix='brewbite-suite-')
+    try:
+        db = DatabaseHandler(f"sqlite:///{prepare(data, directory)}")
+        results = Suite(db, data, args.seed).run(args.case, args.repeat_scale)
+        db.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        'scale': data.describe(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if {k: v for k, v in baseline['scale'].items() if k != 'end'} != \
+                {k: v for k, v in report['scale'].items() if k != 'end'}:
+            print(f"baseline {args.baseline} was recorded at a different scale, not comparing")
+            baseline = None
+
+    rows, regressions = compare(results, baseline or {}, args.tolerance)
+    print(f"{'case':<28} {'runs':>5} {'p50 ms':>9} {'p99 ms':>9} {'baseline':>9} {'change':>8}")
+    for name, before, _, change in rows:
+        current = results[name]
+        print(f"{name:<28} {current['runs']:>5} {current['p50'] * 1000:>9.3f} {current['p99'] * 1000:>9.3f} "
+              + (f"{before * 1000:>9.3f} {change:>+8.1%}" if before is not None else f"{'-':>9} {'-':>8}")
+              + ("  REGRESSION" if name in regressions else ""))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+        print(f"saved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"result: FAILED, {len(regressions)} case(s) slower than the baseline by over {args.tolerance:.0%}")
+        sys.exit(1)
+    print("result: OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Sales per second with a commit per sale against the write-behind journal with group
+# commit. For write-behind both the rate the till sees (journal append) and the rate
+# at which sales reach the database are reported.
+#
+#   python -m benchmarks.bench_write_behind --sales 2000
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from database.db_handler import DatabaseHandler, DEFAULT_PROFILE
+from database.models import Sale
+from business.inventory_manager import InventoryManager
+from business.sales_manager import SalesManager
+
+
+def setup(directory, args):
+    # --sqlite-defaults keeps the rollback journal and a full fsync on every commit
+    profile = DEFAULT_PROFILE if args.sqlite_defaults else None
+    db = DatabaseHandler(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile=profile)
+    inventory = InventoryManager(db)
+    item_ids = [inventory.add_item(f"item {i}", 10 ** 9, 2.5).item_id for i in range(args.items)]
+    return db, inventory, item_ids
+
+
+def carts(item_ids, count, seed):
+    rng = random.Random(seed)
+    return [[(rng.choice(item_ids), rng.randint(1, 3)) for _ in range(rng.randint(1, 4))] for _ in range(count)]
+
+
+def run_sync(args, orders):
+    directory = tempfile.mkdtemp(prefix='brewbite-sync-')
+    db, inventory, item_ids = setup(directory, args)
+    sales = SalesManager(db, inventory_cache=inventory.cache)
+    started = time.perf_counter()
+    for cart in orders(item_ids):
+        sales.create_sale(1, cart)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return elapsed
+
+
+def run_write_behind(args, orders):
+    directory = tempfile.mkdtemp(prefix='brewbite-journal-')
+    db, inventory, item_ids = setup(directory, args)
+    sales = SalesManager(db, inventory_cache=inventory.cache,
+                         journal_path=os.path.join(directory, 'sales.journal'))
+    started = time.perf_counter()
+    for cart in orders(item_ids):
+        sales.create_sale(1, cart)
+    submitted = time.perf_counter() - started
+    sales.write_behind.flush()
+    drained = time.perf_counter() - started
+    batches = sales.write_behind.batches
+    sales.close()
+
+    with db.session_scope() as session:
+        saved = session.execute(select(func.count()).select_from(Sale)).scalar()
+    db.close()
+    return submitted, drained, batches, saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronous commits against write-behind group commit")
+    parser.add_argument('--sales', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--sqlite-defaults', action='store_true',
+                        help="use sqlite's default pragmas instead of the performance profile")
+    args = parser.parse_args()
+
+    def orders(item_ids):
+        return carts(item_ids, args.sales, args.seed)
+
+    sync = run_sync(args, orders)
+    submitted, drained, batches, saved = run_write_behind(args, orders)
+
+    print(f"synchronous:            {args.sales / sync:8.0f} sales/s")
+    print(f"write-behind, till:     {args.sales / submitted:8.0f} sales/s")
+    print(f"write-behind, database: {args.sales / drained:8.0f} sales/s "
+          f"({batches} group commits, {args.sales / batches:.1f} sales each)")
+    if saved != args.sales:
+        print(f"MISMATCH: {saved} of {args.sales} sales reached the database")
+
+
+if __name__ == '__main__':
+    main()
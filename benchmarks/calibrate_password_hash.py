@@ -0,0 +1,52 @@
+# Picks KDF parameters for this host: the work factor of each algorithm is doubled
+# until one verification takes at least the target time.
+#
+#   python -m benchmarks.calibrate_password_hash --target-ms 250
+
+import argparse
+import statistics
+import time
+
+from business.password_hasher import Pbkdf2Hasher, ScryptHasher, SCRYPT_R, SCRYPT_P
+
+
+def verify_ms(hasher, repeats):
+    encoded = hasher.hash('correct horse battery staple')
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        hasher.verify('correct horse battery staple', encoded)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(make_hasher, start, target_ms, repeats, limit):
+    # returns (work factor, verify ms) for the cheapest factor reaching target_ms
+    factor = start
+    elapsed = verify_ms(make_hasher(factor), repeats)
+    while elapsed < target_ms and factor * 2 <= limit:
+        factor *= 2
+        elapsed = verify_ms(make_hasher(factor), repeats)
+    return factor, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate password hashing cost to a target verify latency")
+    parser.add_argument('--target-ms', type=float, default=250.0)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-scrypt-n', type=int, default=2 ** 20, help="caps scrypt memory (128 * n * r bytes)")
+    args = parser.parse_args()
+
+    iterations, pbkdf2_ms = calibrate(Pbkdf2Hasher, 10_000, args.target_ms, args.repeats, 2 ** 32)
+    n, scrypt_ms = calibrate(lambda n: ScryptHasher(n=n), 2 ** 10, args.target_ms, args.repeats, args.max_scrypt_n)
+
+    print(f"target verify time: {args.target_ms:.0f} ms")
+    print(f"pbkdf2_sha256: iterations={iterations:<10} {pbkdf2_ms:7.1f} ms")
+    print(f"scrypt:        n={n:<17} {scrypt_ms:7.1f} ms  (r={SCRYPT_R}, p={SCRYPT_P}, "
+          f"{128 * n * SCRYPT_R // 2 ** 20} MiB)")
+    print("Set PBKDF2_ITERATIONS / SCRYPT_N in business/password_hasher.py or pass them to the hashers; "
+          "stored hashes are upgraded on the next login.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# EXPLAIN QUERY PLAN regression check for the report and checkout queries.
+# Fails (exit code 1) if any of them falls back to a full table scan.
+#
+#   python -m benchmarks.check_query_plans [--db sqlite:///cafe.db]
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date
+
+from sqlalchemy import func, select
+
+from database.db_handler import DatabaseHandler
+from database.models import Expense, Inventory, Sale, SaleItem
+from business.report_engine import ReportEngine
+from business.inventory_manager import InventoryManager
+
+# reports that list every item on purpose, a full scan is the correct plan for them
+WHOLE_TABLE_REPORTS = {"inventory status", "inventory value"}
+
+
+def report_queries(engine, inventory):
+    first_day = date.today().replace(day=1)
+
+    return engine.queries() + [
+        ("item page by id", inventory.items_query(after=100)),
+        ("item page by name", inventory.items_query(after=('oat latte', 100), order_by='item_name')),
+        ("item page by quantity", inventory.items_query(after=(20, 100), order_by='quantity')),
+        ("item name search", inventory.items_query(name_prefix='oat', order_by='item_name')),
+        ("user sales history", select(Sale).where(Sale.user_id == 1, Sale.date >= first_day)),
+        ("lines of a sale", select(SaleItem).where(SaleItem.sale_id == 1)),
+        ("sales of an item", select(func.sum(SaleItem.quantity)).where(SaleItem.item_id == 1)),
+        ("sale lines join", select(SaleItem.quantity, Sale.date)
+            .join(Sale, Sale.sale_id == SaleItem.sale_id).where(Sale.date >= first_day)),
+        ("expenses by category", select(Expense.category, func.sum(Expense.amount))
+            .where(Expense.date >= first_day).group_by(Expense.category)),
+        ("checkout stock lookup", select(Inventory.item_id, Inventory.item_name, Inventory.cost)
+            .where(Inventory.item_id.in_([1, 2, 3]))),
+    ]
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    # "SCAN table" without an index is a full table scan, temp b-trees are fine
+    return [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that report queries use indexes")
+    parser.add_argument('--db', help="database url, defaults to a fresh scratch database")
+    args = parser.parse_args()
+
+    db_url = args.db or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='brewbite-plans-'), 'plans.db')}"
+    db = DatabaseHandler(db_url)
+    inventory = InventoryManager(db)
+
+    failures = 0
+    with db.engine.connect() as connection:
+        for name, statement in report_queries(ReportEngine(db), inventory):
+            plan = explain(connection, statement)
+            scans = full_scans(plan) if name not in WHOLE_TABLE_REPORTS else []
+            failures += bool(scans)
+            print(f"{'FULL SCAN' if scans else 'ok':9}  {name}")
+            for step in plan:
+                print(f"           {step}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
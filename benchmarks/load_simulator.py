@@ -0,0 +1,235 @@
+# Multi-till load simulator. Every till is a worker process (or thread) with its own
+# DatabaseHandler on one shared SQLite file, serving customers that arrive at random
+# (Poisson) at --rate per second: browse the catalog, check out, and now and then a
+# stock edit or a staff login. Reports throughput, p50/p99 latency per operation,
+# time spent waiting for the write lock and how often SQLite said "database is locked".
+#
+#   python -m benchmarks.load_simulator --tills 6 --rate 5 --duration 30
+#   python -m benchmarks.load_simulator --tills 6 --threads --sqlite-defaults
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+from sqlalchemy import event
+
+from database.db_handler import DatabaseHandler, DEFAULT_PROFILE
+from business.instrumentation import Histogram
+from business.inventory_manager import InventoryManager
+from business.sales_manager import SalesManager
+from business.stock_reservation import is_busy_error
+from business.user_manager import UserManager
+from benchmarks.bench_suite import prepare
+from benchmarks.synthetic_data import PASSWORD, SyntheticData
+
+# share of customers that trigger a stock edit or a staff login instead of only a checkout
+EDIT_RATIO = 0.05
+LOGIN_RATIO = 0.02
+
+# what a customer types into the search box before picking items
+SEARCHES = ["latte", "oat", "flat", "croissant", "caramel", "muffin", "large", "iced", "scone", "mocha"]
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class LockProbe:
+    """
+    Engine hooks for what the managers do not surface: the time the first write of a
+    transaction took, which is where SQLite waits for the write lock (busy_timeout),
+    and every "database is locked" error the driver raised, retried or not.
+    """
+
+    def __init__(self, engine):
+        self.lock_wait = Histogram()
+        self.locked_errors = 0
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'commit', self._end)
+        event.listen(engine, 'rollback', self._end)
+        event.listen(engine, 'handle_error', self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get('lock_held') and statement.lstrip().upper().startswith(WRITES):
+            conn.info['lock_started'] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('lock_started', None)
+        if started is not None:
+            conn.info['lock_held'] = True
+            self.lock_wait.observe(time.perf_counter() - started)
+
+    def _end(self, conn):
+        conn.info.pop('lock_held', None)
+        conn.info.pop('lock_started', None)
+
+    def _error(self, context):
+        if is_busy_error(context.original_exception):
+            self.locked_errors += 1
+        if context.connection is not None:
+            context.connection.info.pop('lock_started', None)
+
+
+def merge(histograms):
+    merged = Histogram()
+    for histogram in histograms:
+        for bucket, count in histogram.buckets.items():
+            merged.buckets[bucket] = merged.buckets.get(bucket, 0) + count
+        merged.count += histogram.count
+        merged.total += histogram.total
+        merged.min = min(merged.min, histogram.min)
+        merged.max = max(merged.max, histogram.max)
+    return merged
+
+
+def till(args):
+    # one till serving customers until the duration is up, returns its measurements
+    db_url, till_id, scale, options = args
+    rng = random.Random(options['seed'] * 1000 + till_id)
+    profile = DEFAULT_PROFILE if options['sqlite_defaults'] else None
+
+    db = DatabaseHandler(db_url, profile=profile)
+    probe = LockProbe(db.engine)
+    inventory = InventoryManager(db)
+    sales = SalesManager(db, inventory_cache=inventory.cache)
+    users = UserManager(db)
+
+    timings = {}
+    failures = {}
+
+    def timed(name, fn, *fn_args):
+        started = time.perf_counter()
+        result = fn(*fn_args)
+        timings.setdefault(name, Histogram()).observe(time.perf_counter() - started)
+        if result is None or result is False:
+            failures[name] = failures.get(name, 0) + 1
+        return result
+
+    def user_name():
+        return f"user{rng.randint(1, scale['users'])}"
+
+    login = timed('login', users.login, user_name(), PASSWORD)
+    user_id = login[0].user_id if login else None
+    # the search index is built on first use, not part of what a customer waits for
+    inventory.search_items(SEARCHES[0])
+
+    # wait for the other tills so everybody starts loading the database together
+    time.sleep(max(0.0, options['start_at'] - time.time()))
+    started = time.perf_counter()
+    deadline = started + options['duration']
+    arrival = started
+    response = Histogram()
+    customers = 0
+
+    while True:
+        # open loop: customers keep arriving on schedule even when the till falls behind,
+        # so a slow checkout shows up as queueing in the response time
+        arrival += rng.expovariate(options['rate'])
+        if arrival >= deadline:
+            break
+        time.sleep(max(0.0, arrival - time.perf_counter()))
+
+        roll = rng.random()
+        if roll < LOGIN_RATIO:
+            login = timed('login', users.login, user_name(), PASSWORD)
+            user_id = login[0].user_id if login else user_id
+        elif roll < LOGIN_RATIO + EDIT_RATIO:
+            timed('stock_edit', inventory.update_quantity, rng.randint(1, scale['items']), rng.randint(100, 10 ** 6))
+
+        found = timed('browse', inventory.search_items, rng.choice(SEARCHES))
+        cart = [(item.item_id, rng.randint(1, 2)) for item in rng.sample(found, min(len(found), rng.randint(1, 4)))]
+        if cart:
+            timed('checkout', sales.create_sale, user_id, cart)
+        response.observe(time.perf_counter() - arrival)
+        customers += 1
+
+    elapsed = time.perf_counter() - started
+    db.close()
+    return {
+        'customers': customers,
+        'elapsed': elapsed,
+        'timings': timings,
+        'failures': failures,
+        'response': response,
+        'lock_wait': probe.lock_wait,
+        'locked_errors': probe.locked_errors,
+        'busy_retries': sales.reservations.busy_retries,
+        'backoff': sales.reservations.busy_wait,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-till load simulator")
+    parser.add_argument('--tills', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=5.0, help="customers per second at each till")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds of load")
+    parser.add_argument('--threads', action='store_true', help="run the tills as threads instead of processes")
+    parser.add_argument('--sqlite-defaults', action='store_true',
+                        help="use sqlite's default pragmas instead of the performance profile")
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--sales', type=int, default=50000, help="sales history in the generated database")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    data = SyntheticData(args.items, args.users, args.sales, seed=args.seed)
+    directory = tempfile.mkdtemp(prefix='brewbite-load-')
+    try:
+        db_url = f"sqlite:///{prepare(data, directory)}"
+        # logins hash on every till first, give them a moment before the clock starts
+        options = {'rate': args.rate, 'duration': args.duration, 'seed': args.seed,
+                   'sqlite_defaults': args.sqlite_defaults, 'start_at': time.time() + 2.0 + 0.1 * args.tills}
+        work = [(db_url, till_id, data.describe(), options) for till_id in range(args.tills)]
+        if args.threads:
+            with ThreadPoolExecutor(args.tills) as pool:
+                results = list(pool.map(till, work))
+        else:
+            with Pool(args.tills) as pool:
+                results = pool.map(till, work)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    elapsed = max(r['elapsed'] for r in results)
+    customers = sum(r['customers'] for r in results)
+    operations = {}
+    for r in results:
+        for name, histogram in r['timings'].items():
+            operations.setdefault(name, []).append(histogram)
+    failures = {}
+    for r in results:
+        for name, failed in r['failures'].items():
+            failures[name] = failures.get(name, 0) + failed
+    checkouts = sum(h.count for h in operations.get('checkout', []))
+    statements_locked = sum(r['locked_errors'] for r in results)
+
+    print(f"tills:            {args.tills} {'threads' if args.threads else 'processes'}, "
+          f"{args.rate:g} customers/s each for {args.duration:g}s"
+          + (", sqlite default pragmas" if args.sqlite_defaults else ""))
+    print(f"throughput:       {customers / elapsed:.1f} customers/s, "
+          f"{(checkouts - failures.get('checkout', 0)) / elapsed:.1f} sales/s")
+    print()
+    print(f"{'operation':<12} {'count':>7} {'failed':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, histograms in sorted(operations.items()):
+        histogram = merge(histograms)
+        print(f"{name:<12} {histogram.count:>7} {failures.get(name, 0):>7} {histogram.quantile(0.5) * 1000:>9.2f} "
+              f"{histogram.quantile(0.99) * 1000:>9.2f} {histogram.max * 1000:>9.2f}")
+    response = merge(r['response'] for r in results)
+    print(f"{'response':<12} {response.count:>7} {'':>7} {response.quantile(0.5) * 1000:>9.2f} "
+          f"{response.quantile(0.99) * 1000:>9.2f} {response.max * 1000:>9.2f}  (from arrival, queueing included)")
+    print()
+
+    lock_wait = merge(r['lock_wait'] for r in results)
+    print(f"write lock wait:  p50 {lock_wait.quantile(0.5) * 1000:.2f} ms, p99 {lock_wait.quantile(0.99) * 1000:.2f} ms, "
+          f"{lock_wait.total:.2f}s in total over {lock_wait.count} transaction(s)")
+    print(f"busy retries:     {sum(r['busy_retries'] for r in results)}, "
+          f"{sum(r['backoff'] for r in results):.2f}s of backoff")
+    print(f"database locked:  {statements_locked} error(s), "
+          f"{statements_locked / max(1, lock_wait.count) * 100:.2f}% of write transactions; "
+          f"{failures.get('checkout', 0)} of {checkouts} checkout(s) failed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Multi-process stress test for the stock reservation engine.
+# Several tills hammer a handful of scarce items on one SQLite file and the
+# script checks that stock was never oversold.
+#
+#   python -m benchmarks.stress_stock_reservation --workers 8 --stock 200
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from sqlalchemy import func, select
+
+from database.db_handler import DatabaseHandler
+from database.models import Inventory, SaleItem
+from business.inventory_manager import InventoryManager
+from business.sales_manager import SalesManager
+
+
+def till_worker(args):
+    db_url, item_ids, max_lines, seed = args
+    rng = random.Random(seed)
+    sold = 0
+    sales = 0
+    failed = 0
+
+    db = DatabaseHandler(db_url)
+    sales_manager = SalesManager(db)
+
+    while True:
+        cart = [(rng.choice(item_ids), rng.randint(1, max_lines)) for _ in range(rng.randint(1, 3))]
+        sale = sales_manager.create_sale(1, cart)
+        if sale is None:
+            failed += 1
+            continue
+
+        sales += 1
+        with db.session_scope() as session:
+            sold += session.execute(
+                select(func.coalesce(func.sum(SaleItem.quantity), 0)).where(SaleItem.sale_id == sale.sale_id)
+            ).scalar()
+
+            # every till keeps selling until the shelves are empty
+            left = session.execute(
+                select(func.sum(Inventory.quantity)).where(Inventory.item_id.in_(item_ids))
+            ).scalar()
+        if not left:
+            break
+    db.close()
+
+    return sold, sales, failed, sales_manager.reservations.busy_retries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-till stock reservation stress test")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=200, help="starting stock per item")
+    parser.add_argument('--max-lines', type=int, default=3, help="largest quantity on one cart line")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='brewbite-stress-')
+    db_url = f"sqlite:///{os.path.join(directory, 'stress.db')}"
+
+    db = DatabaseHandler(db_url)
+    inventory = InventoryManager(db)
+    item_ids = [inventory.add_item(f"item {i}", args.stock, 1.0).item_id for i in range(args.items)]
+    db.close()
+
+    started = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.map(till_worker, [
+            (db_url, item_ids, args.max_lines, seed) for seed in range(args.workers)
+        ])
+    elapsed = time.perf_counter() - started
+
+    sold = sum(r[0] for r in results)
+    sales = sum(r[1] for r in results)
+    failed = sum(r[2] for r in results)
+    retries = sum(r[3] for r in results)
+
+    db = DatabaseHandler(db_url)
+    with db.session_scope() as session:
+        remaining = session.execute(select(func.sum(Inventory.quantity))).scalar()
+        negative = session.execute(select(func.count()).where(Inventory.quantity < 0)).scalar()
+        recorded = session.execute(select(func.coalesce(func.sum(SaleItem.quantity), 0))).scalar()
+    starting = args.items * args.stock
+
+    print(f"workers:            {args.workers}")
+    print(f"sales committed:    {sales} ({failed} gave up while busy)")
+    print(f"busy retries:       {retries}")
+    print(f"units sold:         {sold} of {starting}")
+    print(f"units remaining:    {remaining}")
+    print(f"throughput:         {sales / elapsed:.1f} sales/s over {elapsed:.2f}s")
+
+    ok = negative == 0 and remaining == 0 and sold == recorded == starting
+    print("result:             " + ("OK, no oversells" if ok else "FAILED, stock does not reconcile"))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
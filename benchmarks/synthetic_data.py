@@ -0,0 +1,195 @@
+# Seeded generator for benchmark databases. The same arguments always produce the same
+# catalog, users and sales, with dates counted back from --end.
+#
+#   python -m benchmarks.synthetic_data bench.db --items 5000 --users 200 --sales 2000000
+
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert, update
+
+from database.db_handler import DatabaseHandler
+from database.models import Inventory, Sale, SaleItem, User
+from business.password_hasher import PasswordHasher
+from business.rollups import rebuild_daily_sales, rebuild_item_sales
+
+# every generated user logs in with this password
+PASSWORD = 'benchmark'
+
+# rows per executemany while loading
+LOAD_BATCH_SIZE = 20000
+
+# lines on a receipt, mostly one or two like a real coffee shop
+BASKET_SIZES = (1, 2, 3, 4, 5, 6)
+BASKET_WEIGHTS = (45, 30, 13, 7, 3, 2)
+
+# busier weekends (Monday first) and a yearly swing peaking in December
+WEEKDAY_WEIGHTS = (0.85, 0.9, 0.9, 0.95, 1.1, 1.35, 1.25)
+SEASONAL_AMPLITUDE = 0.25
+
+# popularity of the n-th item falls off as 1 / n ** ZIPF_EXPONENT
+ZIPF_EXPONENT = 1.1
+
+PRODUCTS = ["Flat White", "Latte", "Cappuccino", "Americano", "Mocha", "Cortado", "Chai Latte",
+            "Hot Chocolate", "Espresso", "Macchiato", "Croissant", "Banana Bread", "Cinnamon Bun",
+            "Toastie", "Bagel", "Brownie", "Scone", "Muffin", "Cookie", "Panini"]
+VARIANTS = ["", "Small", "Large", "Oat", "Vanilla", "Caramel", "Iced", "Vegan", "Decaf"]
+
+
+def day_weights(days, end):
+    # relative number of sales on each of the days up to and including end
+    weights = []
+    for offset in range(days):
+        day = end - timedelta(days=days - 1 - offset)
+        season = 1 + SEASONAL_AMPLITUDE * math.cos(2 * math.pi * (day.timetuple().tm_yday - 355) / 365)
+        weights.append((day, WEEKDAY_WEIGHTS[day.weekday()] * season))
+    return weights
+
+
+def spread(total, weights):
+    # splits total into whole counts proportional to weights, largest remainders first
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    remainders = sorted(range(len(weights)), key=lambda i: counts[i] - weights[i] * scale)
+    for i in remainders[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+class SyntheticData:
+    """
+    Builds a benchmark database at a given scale. Items get Zipf distributed
+    popularity, baskets follow BASKET_WEIGHTS and sales per day follow the weekday and
+    seasonal pattern, so reports and checkouts see realistic data shapes.
+    """
+
+    def __init__(self, items=5000, users=200, sales=2000000, days=365, end=None, seed=1):
+        self.items = items
+        self.users = users
+        self.sales = sales
+        self.days = days
+        self.end = end or date.today()
+        self.seed = seed
+
+    def describe(self):
+        return {'items': self.items, 'users': self.users, 'sales': self.sales, 'days': self.days,
+                'end': self.end.isoformat(), 'seed': self.seed}
+
+    def catalog(self, rng):
+        # (item_id, item_name, quantity, cost), names are unique like supplier codes
+        rows = []
+        names = itertools.product(range(1, 1 + -(-self.items // (len(PRODUCTS) * len(VARIANTS)))),
+                                  VARIANTS, PRODUCTS)
+        for item_id, (code, variant, product) in enumerate(itertools.islice(names, self.items), start=1):
+            name = " ".join(part for part in (variant, product, str(code)) if part)
+            # a few items start low so the low stock report has something to show
+            quantity = rng.randint(0, 15) if rng.random() < 0.05 else rng.randint(50, 5000)
+            rows.append({'item_id': item_id, 'item_name': name, 'quantity': quantity,
+                         'cost': round(rng.uniform(0.8, 6.5), 2)})
+        return rows
+
+    def user_rows(self):
+        # one hash shared by every user, hashing is slow on purpose and would dominate the build
+        password = PasswordHasher().hash(PASSWORD)
+        return [{'user_id': user_id, 'username': f"user{user_id}", 'password': password,
+                 'email': f"user{user_id}@example.com"} for user_id in range(1, self.users + 1)]
+
+    def sale_batches(self, rng, costs, batch_size=LOAD_BATCH_SIZE):
+        # yields (sales, sale_items) row batches in date order
+        popularity = list(itertools.accumulate(1 / rank ** ZIPF_EXPONENT for rank in range(1, self.items + 1)))
+        # popularity rank is not item order, otherwise the cheapest names would always sell best
+        ranked = list(range(1, self.items + 1))
+        rng.shuffle(ranked)
+        top = popularity[-1]
+
+        weights = day_weights(self.days, self.end)
+        per_day = spread(self.sales, [w for _, w in weights])
+        sale_id = 0
+        sale_item_id = 0
+        sales, lines = [], []
+        for (day, _), count in zip(weights, per_day):
+            for _ in range(count):
+                sale_id += 1
+                basket = {}
+                for _ in range(rng.choices(BASKET_SIZES, BASKET_WEIGHTS)[0]):
+                    item_id = ranked[bisect.bisect_left(popularity, rng.random() * top)]
+                    basket[item_id] = basket.get(item_id, 0) + (1 if rng.random() < 0.85 else 2)
+
+                total = 0.0
+                for item_id, quantity in basket.items():
+                    sale_item_id += 1
+                    lines.append({'sale_item_id': sale_item_id, 'sale_id': sale_id,
+                                  'item_id': item_id, 'quantity': quantity})
+                    total += quantity * costs[item_id]
+                sales.append({'sale_id': sale_id, 'user_id': rng.randint(1, self.users), 'date': day,
+                              'total_amount': round(total, 2)})
+
+                if len(lines) >= batch_size:
+                    yield sales, lines
+                    sales, lines = [], []
+        if sales:
+            yield sales, lines
+
+    def build(self, db_url, log=None):
+        # loads everything into an empty database and rebuilds the report rollups
+        rng = random.Random(self.seed)
+        db = DatabaseHandler(db_url)
+        try:
+            catalog = self.catalog(rng)
+            costs = {row['item_id']: row['cost'] for row in catalog}
+            with db.session_scope() as session:
+                connection = session.connection()
+                connection.execute(insert(Inventory), catalog)
+                connection.execute(insert(User), self.user_rows())
+
+            loaded = 0
+            for sales, lines in self.sale_batches(rng, costs):
+                with db.session_scope() as session:
+                    connection = session.connection()
+                    connection.execute(insert(Sale), sales)
+                    connection.execute(insert(SaleItem), lines)
+                loaded += len(sales)
+                if log:
+                    log(f"  {loaded} of {self.sales} sales")
+
+            with db.session_scope() as session:
+                connection = session.connection()
+                rebuild_daily_sales(connection)
+                rebuild_item_sales(connection)
+                # plenty of stock left so benchmark checkouts never run dry
+                connection.execute(update(Inventory).where(Inventory.quantity > 15)
+                                   .values(quantity=Inventory.quantity + 10 ** 6))
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql("ANALYZE")
+        finally:
+            db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded benchmark database")
+    parser.add_argument('path', help="sqlite file to create")
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--sales', type=int, default=2000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--end', type=date.fromisoformat, help="last day with sales, YYYY-MM-DD (default: today)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+
+    data = SyntheticData(args.items, args.users, args.sales, args.days, args.end, args.seed)
+    started = time.perf_counter()
+    data.build(f"sqlite:///{args.path}", log=print)
+    print(f"built {args.path} in {time.perf_counter() - started:.1f}s: {data.describe()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from sqlalchemy import delete, insert, select
+from database.models import AuthToken, User
+
+# how long a login stays valid without entering the password again (seconds)
+TOKEN_TTL = 8 * 60 * 60
+
+# with a shared table, how long a till trusts its memory before checking for revocations (seconds)
+RECHECK_INTERVAL = 30
+
+# how often issue() also drops expired tokens from memory and the table (seconds)
+PURGE_INTERVAL = 10 * 60
+
+
+class Principal:
+    """
+    The logged in user as the windows see it: plain values, detached from any database
+    session and immutable, so it can be handed to every window and worker thread.
+    """
+
+    __slots__ = ('user_id', 'username')
+
+    def __init__(self, user_id, username):
+        object.__setattr__(self, 'user_id', user_id)
+        object.__setattr__(self, 'username', username)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.user_id, user.username)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Principal is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Principal is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Principal) and (self.user_id, self.username) == (other.user_id, other.username)
+
+    def __hash__(self):
+        return hash((self.user_id, self.username))
+
+    def __repr__(self):
+        return f"Principal(user_id={self.user_id!r}, username={self.username!r})"
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenStore:
+    """
+    Maps opaque session tokens to principals until they expire. Lookups are a dict hit
+    in memory. With a db_handler the tokens are also written to the auth_tokens table,
+    so a token issued on one till can be resumed on another; the table only stores a
+    hash of each token. Another till may revoke a token, so remembered entries are
+    then read again from the table every recheck seconds.
+
+    A token issued with the password also keeps a verifier for it, an HMAC under a key
+    that never leaves this process, so check_password() can confirm the owner without
+    the users table or the KDF.
+    """
+
+    def __init__(self, db_handler=None, ttl=TOKEN_TTL, recheck=RECHECK_INTERVAL, clock=time.time):
+        self.db = db_handler
+        self.ttl = ttl
+        self.recheck = recheck
+        self.clock = clock
+        self._tokens = {}  # token hash -> (principal, trusted until)
+        self._verifiers = {}  # token hash -> (user_id, password verifier, expires at)
+        self._verifier_key = secrets.token_bytes(32)
+        self._next_purge = clock() + PURGE_INTERVAL
+        self._lock = threading.Lock()
+
+    def _verifier(self, key, password):
+        # bound to the token too, so equal passwords give unrelated verifiers
+        return hmac.new(self._verifier_key, key.encode() + b'\0' + password.encode(), hashlib.sha256).digest()
+
+    def _trusted_until(self, expires_at, now):
+        return min(expires_at, now + self.recheck) if self.db else expires_at
+
+    def issue(self, principal, password=None):
+        token = secrets.token_urlsafe(32)
+        key = _token_hash(token)
+        now = self.clock()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._tokens[key] = (principal, self._trusted_until(expires_at, now))
+            if password is not None:
+                self._verifiers[key] = (principal.user_id, self._verifier(key, password), expires_at)
+            purge = now >= self._next_purge
+            if purge:
+                self._next_purge = now + PURGE_INTERVAL
+        if purge:
+            self.purge()
+        if self.db:
+            with self.db.session_scope() as session:
+                session.execute(insert(AuthToken).values(token_hash=key, user_id=principal.user_id,
+                                                         expires_at=expires_at))
+        return token
+
+    def _load(self, key, now):
+        # a token issued by another till, read together with its user in one query
+        with self.db.session_scope() as session:
+            row = session.execute(
+                select(User.user_id, User.username, AuthToken.expires_at)
+                .join(User, User.user_id == AuthToken.user_id)
+                .where(AuthToken.token_hash == key, AuthToken.expires_at > now)
+            ).first()
+        if row is None:
+            return None
+        entry = (Principal(row.user_id, row.username), self._trusted_until(row.expires_at, now))
+        with self._lock:
+            self._tokens[key] = entry
+        return entry
+
+    def resolve(self, token):
+        # the principal a token belongs to, or None when it is unknown, revoked or expired
+        key = _token_hash(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._tokens[key]
+                entry = None
+        if entry is None and self.db:
+            entry = self._load(key, now)
+        return entry[0] if entry else None
+
+    def check_password(self, token, password):
+        # True or False when the token was issued here with a password, None otherwise
+        key = _token_hash(token)
+        with self._lock:
+            held = self._verifiers.get(key)
+        if held is None or held[2] <= self.clock():
+            return None
+        return hmac.compare_digest(held[1], self._verifier(key, password))
+
+    def revoke(self, token):
+        key = _token_hash(token)
+        with self._lock:
+            self._tokens.pop(key, None)
+            self._verifiers.pop(key, None)
+        if self.db:
+            with self.db.session_scope() as session:
+                session.execute(delete(AuthToken).where(AuthToken.token_hash == key))
+
+    def revoke_user(self, user_id):
+        # ends every session of a user, e.g. after a password change
+        with self._lock:
+            for key in [key for key, (principal, _) in self._tokens.items() if principal.user_id == user_id]:
+                del self._tokens[key]
+            for key in [key for key, (held_by, _, _) in self._verifiers.items() if held_by == user_id]:
+                del self._verifiers[key]
+        if self.db:
+            with self.db.session_scope() as session:
+                session.execute(delete(AuthToken).where(AuthToken.user_id == user_id))
+
+    def purge(self):
+        # drops expired tokens, returns how many were held in memory
+        now = self.clock()
+        with self._lock:
+            expired = [key for key, (_, until) in self._tokens.items() if until <= now]
+            for key in expired:
+                del self._tokens[key]
+            for key in [key for key, (_, _, expires_at) in self._verifiers.items() if expires_at <= now]:
+                del self._verifiers[key]
+        if self.db:
+            with self.db.session_scope() as session:
+                session.execute(delete(AuthToken).where(AuthToken.expires_at <= now))
+        return len(expired)
+
+    def __len__(self):
+        return len(self._tokens)
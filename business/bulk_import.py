@@ -0,0 +1,278 @@
+import csv
+import gzip
+import json
+import time
+from itertools import islice
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database.models import Inventory
+
+# rows validated and written per transaction
+IMPORT_BATCH_SIZE = 5000
+
+# item_name column length in the inventory table
+MAX_NAME_LENGTH = 100
+
+# catalog imports insert new items and update existing ones,
+# stock-takes only set the counted quantity of items that already exist
+IMPORT_MODES = ('catalog', 'stocktake')
+
+
+def read_csv(file):
+    # header row with item_name, quantity and (optionally) cost
+    return csv.DictReader(file)
+
+
+def read_json(file):
+    # a single JSON array of objects, loaded whole since the json module cannot stream it
+    rows = json.load(file)
+    if not isinstance(rows, list):
+        raise ValueError("A JSON import must hold an array of item objects.")
+    return rows
+
+
+def read_json_lines(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'jsonl': read_json_lines,
+}
+
+
+def guess_format(path):
+    # format from the file extension, ignoring a trailing .gz
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = name.rsplit('.', 1)[-1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Cannot tell the import format of '{path}', pass it explicitly.")
+    return extension
+
+
+class ImportReport:
+    """
+    Reconciliation of an import against the inventory as it was before:
+    added and changed hold (item_name, old quantity, new quantity, old cost, new cost),
+    rejected holds (line number, reason) and missing the (item_id, item_name, quantity)
+    of items a stock-take did not count.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.changed = []
+        self.unchanged = 0
+        self.rejected = []
+        self.missing = []
+        self.seconds = 0.0
+
+    @property
+    def rows(self):
+        return len(self.added) + len(self.changed) + self.unchanged + len(self.rejected)
+
+    def summary(self):
+        rate = self.rows / self.seconds if self.seconds else 0
+        lines = [f"Read {self.rows} row(s) in {self.seconds:.2f}s ({rate:,.0f} rows/s): "
+                 f"{len(self.added)} added, {len(self.changed)} changed, "
+                 f"{self.unchanged} unchanged, {len(self.rejected)} rejected."]
+        if self.missing:
+            lines.append(f"{len(self.missing)} item(s) in the inventory were not counted.")
+        return "\n".join(lines)
+
+    def write_diff(self, file):
+        # one CSV line per difference, suitable for review in a spreadsheet
+        writer = csv.writer(file)
+        writer.writerow(['status', 'item_name', 'old_quantity', 'new_quantity', 'old_cost', 'new_cost', 'note'])
+        for name, _, quantity, _, cost in self.added:
+            writer.writerow(['added', name, '', quantity, '', cost, ''])
+        for name, old_quantity, quantity, old_cost, cost in self.changed:
+            writer.writerow(['changed', name, old_quantity, quantity, old_cost, cost, ''])
+        for _, name, quantity in self.missing:
+            writer.writerow(['not counted', name, quantity, '', '', '', ''])
+        for line, reason in self.rejected:
+            writer.writerow(['rejected', '', '', '', '', '', f"line {line}: {reason}"])
+
+
+class BulkImporter:
+    """
+    Streams item rows from a file into the inventory. Rows are validated a batch at a
+    time against the items already stored, and every batch is written with one
+    executemany INSERT ... ON CONFLICT(item_name) DO UPDATE in its own transaction,
+    so a catalog of 100k lines costs a few dozen commits instead of one per line.
+    Rows that would not change anything are not written at all.
+    """
+
+    def __init__(self, db_handler, batch_size=IMPORT_BATCH_SIZE, events=None):
+        self.db = db_handler
+        self.batch_size = batch_size
+
+        # optional inventory ChangeNotifier, told about every added or changed item
+        self.events = events
+
+    @staticmethod
+    def _validate(row):
+        # returns (item_name, quantity, cost or None) or raises ValueError with the reason
+        if not isinstance(row, dict):
+            raise ValueError("not an object")
+
+        name = str(row.get('item_name') or '').strip()
+        if not name:
+            raise ValueError("item_name is missing")
+        if len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f"item_name is longer than {MAX_NAME_LENGTH} characters")
+
+        try:
+            quantity = int(row.get('quantity'))
+        except (TypeError, ValueError):
+            raise ValueError(f"quantity '{row.get('quantity')}' is not a whole number")
+        if quantity < 0:
+            raise ValueError("quantity must be non-negative")
+
+        cost = row.get('cost')
+        if cost in (None, ''):
+            cost = None
+        else:
+            try:
+                cost = float(cost)
+            except (TypeError, ValueError):
+                raise ValueError(f"cost '{cost}' is not a number")
+            if cost < 0:
+                raise ValueError("cost must be non-negative")
+        return name, quantity, cost
+
+    def _reconcile(self, session, batch, mode, report):
+        # compares a validated batch with the stored items, returns the rows to write
+        names = [name for _, name, _, _ in batch]
+        stored = {
+            name: (item_id, quantity, cost)
+            for item_id, name, quantity, cost in session.execute(
+                select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+                .where(Inventory.item_name.in_(names))
+            )
+        }
+
+        writes = []
+        for line, name, quantity, cost in batch:
+            current = stored.get(name)
+            if current is None:
+                if mode == 'stocktake':
+                    report.rejected.append((line, f"'{name}' is not in the inventory"))
+                    continue
+                if cost is None:
+                    report.rejected.append((line, f"new item '{name}' has no cost"))
+                    continue
+                report.added.append((name, None, quantity, None, cost))
+                writes.append({'item_name': name, 'quantity': quantity, 'cost': cost})
+                continue
+
+            _, old_quantity, old_cost = current
+            if cost is None or mode == 'stocktake':
+                # a row without a cost keeps the stored one, a stock-take only counts quantities
+                cost = old_cost
+            if quantity == old_quantity and cost == old_cost:
+                report.unchanged += 1
+                continue
+            report.changed.append((name, old_quantity, quantity, old_cost, cost))
+            writes.append({'item_name': name, 'quantity': quantity, 'cost': cost})
+        return writes
+
+    def _write(self, session, writes):
+        statement = sqlite_insert(Inventory)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[Inventory.item_name],
+                set_={'quantity': statement.excluded.quantity, 'cost': statement.excluded.cost}
+            ),
+            writes
+        )
+
+    def _publish(self, session, writes):
+        # the new rows, ids included, for the cache and the search index
+        names = [write['item_name'] for write in writes]
+        rows = session.execute(
+            select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+            .where(Inventory.item_name.in_(names))
+        ).all()
+        return [tuple(row) for row in rows]
+
+    def _missing(self, counted):
+        # items a stock-take did not mention, read in id order a page at a time
+        missing = []
+        with self.db.session_scope() as session:
+            result = session.execute(
+                select(Inventory.item_id, Inventory.item_name, Inventory.quantity)
+                .order_by(Inventory.item_id)
+                .execution_options(yield_per=self.batch_size)
+            )
+            for item_id, name, quantity in result:
+                if name not in counted:
+                    missing.append((item_id, name, quantity))
+        return missing
+
+    def import_rows(self, rows, mode='catalog', dry_run=False, check=None):
+        """
+        Imports an iterable of dicts with item_name, quantity and cost keys.
+        With dry_run the reconciliation is worked out but nothing is written.
+        Returns an ImportReport.
+        """
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Unknown import mode '{mode}'.")
+
+        report = ImportReport()
+        seen = {}
+        started = time.perf_counter()
+        numbered = enumerate(rows, start=1)
+
+        while True:
+            chunk = list(islice(numbered, self.batch_size))
+            if not chunk:
+                break
+            if check:
+                check()
+
+            batch = []
+            for line, row in chunk:
+                try:
+                    name, quantity, cost = self._validate(row)
+                except ValueError as e:
+                    report.rejected.append((line, str(e)))
+                    continue
+                if name in seen:
+                    report.rejected.append((line, f"'{name}' already appeared on line {seen[name]}"))
+                    continue
+                seen[name] = line
+                batch.append((line, name, quantity, cost))
+
+            if not batch:
+                continue
+
+            changed = []
+            with self.db.session_scope() as session:
+                writes = self._reconcile(session, batch, mode, report)
+                if writes and not dry_run:
+                    self._write(session, writes)
+                    if self.events:
+                        changed = self._publish(session, writes)
+
+            for row in changed:
+                self.events.publish('updated', row)
+
+        if mode == 'stocktake':
+            report.missing = self._missing(seen)
+
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def import_file(self, path, fmt=None, mode='catalog', dry_run=False, check=None):
+        # reads a csv / json / jsonl file, optionally gzipped
+        fmt = fmt or guess_format(path)
+        if fmt not in READERS:
+            raise ValueError(f"Unknown import format '{fmt}'.")
+
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', newline='', encoding='utf-8') as file:
+            return self.import_rows(READERS[fmt](file), mode=mode, dry_run=dry_run, check=check)
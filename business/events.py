@@ -0,0 +1,35 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeNotifier:
+    """
+    Minimal publish/subscribe hub the managers use to announce changes, so windows
+    can update the affected rows instead of reloading everything.
+    Listeners are called as listener(event, payload) on the thread that made the change.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def publish(self, event, payload):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event, payload)
+            except Exception:
+                logger.exception("Error in change listener for '%s'", event)
@@ -0,0 +1,213 @@
+import csv
+import gzip
+import json
+import struct
+import time
+from array import array
+from datetime import date
+
+from sqlalchemy import Date, Float, Integer, select
+from database.models import DailySalesSummary, Expense, Inventory, ItemSalesDaily, Sale, SaleItem
+
+# rows pulled from the cursor and written per batch
+EXPORT_BATCH_SIZE = 5000
+
+# tables that can be exported, tables with a date column can be limited to a date range
+DATASETS = {
+    'sales': Sale,
+    'sales_items': SaleItem,
+    'inventory': Inventory,
+    'expenses': Expense,
+    'daily_sales_summary': DailySalesSummary,
+    'item_sales_daily': ItemSalesDaily,
+}
+
+COLUMNAR_MAGIC = b'BBCOL1\n'
+
+
+def _column_kind(column):
+    # one letter type code used by the columnar format
+    if isinstance(column.type, Integer):
+        return 'i'
+    if isinstance(column.type, Float):
+        return 'f'
+    if isinstance(column.type, Date):
+        return 'd'
+    return 's'
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+class CsvWriter:
+
+    binary = False
+
+    def __init__(self, file, columns):
+        self.writer = csv.writer(file)
+        self.writer.writerow([column.name for column in columns])
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter:
+
+    binary = False
+
+    def __init__(self, file, columns):
+        self.file = file
+        self.names = [column.name for column in columns]
+
+    def write_batch(self, rows):
+        self.file.write("".join(
+            json.dumps(dict(zip(self.names, map(_json_value, row)))) + "\n" for row in rows
+        ))
+
+    def close(self):
+        pass
+
+
+class ColumnarWriter:
+    """
+    Compact binary format: a JSON header with the column names and types, then one
+    block per batch holding each column contiguously (null bitmap followed by packed
+    int64 / float64 / day-number values or length-prefixed UTF-8 strings). A block
+    with a row count of 0 ends the file.
+    """
+
+    binary = True
+
+    def __init__(self, file, columns):
+        self.file = file
+        self.kinds = [_column_kind(column) for column in columns]
+        header = json.dumps({'columns': [column.name for column in columns], 'types': self.kinds})
+        file.write(COLUMNAR_MAGIC)
+        file.write(header.encode() + b'\n')
+
+    def write_batch(self, rows):
+        if not rows:
+            return
+        self.file.write(struct.pack('<I', len(rows)))
+        for index, kind in enumerate(self.kinds):
+            values = [row[index] for row in rows]
+            self.file.write(self._null_bitmap(values))
+            self.file.write(self._encode(kind, values))
+
+    def close(self):
+        self.file.write(struct.pack('<I', 0))
+
+    @staticmethod
+    def _null_bitmap(values):
+        bits = 0
+        for position, value in enumerate(values):
+            if value is None:
+                bits |= 1 << position
+        return bits.to_bytes((len(values) + 7) // 8, 'little')
+
+    @staticmethod
+    def _encode(kind, values):
+        if kind == 'i':
+            return array('q', (v if v is not None else 0 for v in values)).tobytes()
+        if kind == 'f':
+            return array('d', (v if v is not None else 0.0 for v in values)).tobytes()
+        if kind == 'd':
+            return array('i', (v.toordinal() if v is not None else 0 for v in values)).tobytes()
+
+        encoded = [(v if v is not None else '').encode() for v in values]
+        return array('I', map(len, encoded)).tobytes() + b''.join(encoded)
+
+
+def read_columnar(file):
+    # yields (column names, rows) blocks from a file written by ColumnarWriter
+    if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar export file.")
+    header = json.loads(file.readline())
+    names, kinds = header['columns'], header['types']
+    sizes = {'i': ('q', 8), 'f': ('d', 8), 'd': ('i', 4)}
+
+    while True:
+        count = struct.unpack('<I', file.read(4))[0]
+        if count == 0:
+            return
+
+        columns = []
+        for kind in kinds:
+            bits = int.from_bytes(file.read((count + 7) // 8), 'little')
+            if kind in sizes:
+                typecode, width = sizes[kind]
+                values = array(typecode)
+                values.frombytes(file.read(count * width))
+                values = list(values)
+                if kind == 'd':
+                    values = [date.fromordinal(v) if v else None for v in values]
+            else:
+                lengths = array('I')
+                lengths.frombytes(file.read(count * 4))
+                blob = file.read(sum(lengths))
+                values, offset = [], 0
+                for length in lengths:
+                    values.append(blob[offset:offset + length].decode())
+                    offset += length
+            columns.append([None if bits >> i & 1 else v for i, v in enumerate(values)])
+
+        yield names, list(zip(*columns))
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'jsonl': JsonLinesWriter,
+    'columnar': ColumnarWriter,
+}
+
+
+class DataExporter:
+
+    def __init__(self, db_handler, batch_size=EXPORT_BATCH_SIZE):
+        self.db = db_handler
+        self.batch_size = batch_size
+
+    def query(self, dataset, start=None, end=None):
+        model = DATASETS[dataset]
+        statement = select(*model.__table__.columns)
+        if start or end:
+            if 'date' not in model.__table__.columns:
+                raise ValueError(f"Dataset '{dataset}' has no date column to filter on.")
+            if start:
+                statement = statement.where(model.date >= start)
+            if end:
+                statement = statement.where(model.date <= end)
+        primary_key = list(model.__table__.primary_key.columns)
+        return statement.order_by(*primary_key), list(model.__table__.columns)
+
+    def export(self, dataset, path, fmt='csv', compress=False, start=None, end=None, check=None):
+        """
+        Streams a dataset from the database into path in fixed-size batches.
+        Returns (rows written, seconds taken).
+        """
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown export format '{fmt}'.")
+        statement, columns = self.query(dataset, start, end)
+        writer_class = WRITERS[fmt]
+
+        mode = 'wb' if writer_class.binary else 'wt'
+        opener = gzip.open if compress else open
+        options = {} if writer_class.binary else {'newline': '', 'encoding': 'utf-8'}
+
+        started = time.perf_counter()
+        rows_written = 0
+        with opener(path, mode, **options) as file, self.db.session_scope() as session:
+            writer = writer_class(file, columns)
+            result = session.execute(statement.execution_options(yield_per=self.batch_size))
+            for batch in result.partitions(self.batch_size):
+                if check:
+                    check()
+                writer.write_batch(batch)
+                rows_written += len(batch)
+            writer.close()
+
+        return rows_written, time.perf_counter() - started
@@ -0,0 +1,180 @@
+import json
+import logging
+import math
+import re
+import threading
+import time
+from functools import wraps
+
+# histogram buckets grow by this factor, so a reported quantile is within about 4.5% of the truth
+BUCKET_GROWTH = 2 ** (1 / 8)
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+class Histogram:
+    """
+    Log-bucketed histogram of durations in seconds. Recording a value is a log and a
+    dict increment, and memory depends on the spread of the values, not their number.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        bucket = math.floor(math.log(value) / _LOG_GROWTH) if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                if bucket is None:
+                    return 0.0
+                # geometric middle of the bucket, clamped to what was actually seen
+                return min(max(BUCKET_GROWTH ** (bucket + 0.5), self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        summary = {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+        }
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.quantile(q)
+        return summary
+
+
+class _Span:
+
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        # a generator closed early (GeneratorExit) is not an error
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.metrics.count(f"{self.name}.errors")
+        return False
+
+
+class Metrics:
+    """
+    In-process counters and timing histograms, keyed by operation name such as
+    'checkout' or 'report.daily_sales'. Use span() around a block, timed() on a
+    function and count() for plain events; snapshot(), to_json() and to_prometheus()
+    read everything back.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def span(self, name):
+        # times the with block, an exception also counts name.errors
+        return _Span(self, name)
+
+    def timed(self, name):
+        # decorator form of span()
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'timings': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='brewbite'):
+        # Prometheus text exposition format, histograms are written as summaries
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = _metric_name(prefix, name) + '_total'
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, timing in sorted(snapshot['timings'].items()):
+            metric = _metric_name(prefix, name) + '_seconds'
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {timing[f"p{round(q * 100)}"]:.9f}')
+            lines.append(f"{metric}_sum {timing['sum']:.9f}")
+            lines.append(f"{metric}_count {timing['count']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # .json files get JSON, anything else the Prometheus text format
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+
+def _metric_name(prefix, name):
+    return f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+
+def configure_logging(level='WARNING'):
+    # level-gated logging for the app and the command line tools
+    logging.basicConfig(level=level.upper() if isinstance(level, str) else level, format=LOG_FORMAT)
+
+
+# the process wide registry the managers record into
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
+count = metrics.count
@@ -0,0 +1,150 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+
+# the catalog changes a few times a day, quantities are kept current by write-through
+DEFAULT_MAX_ITEMS = 50000
+DEFAULT_TTL = 300.0  # seconds
+
+CachedItem = namedtuple('CachedItem', 'item_id item_name quantity cost')
+
+
+class InventoryCache:
+    """
+    In-process read cache of inventory rows indexed by id and by name, with LRU
+    eviction past max_items and a time-to-live per entry. Writes made through this
+    process are applied to it directly, the TTL bounds how stale rows changed by
+    other tills can get.
+    """
+
+    def __init__(self, max_items=DEFAULT_MAX_ITEMS, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.clock = clock
+
+        self._lock = threading.RLock()
+        self._by_id = OrderedDict()  # item_id -> (CachedItem, expires_at)
+        self._by_name = {}  # item_name -> item_id
+        self._sorted_ids = None  # item ids in order, rebuilt lazily
+        self._complete_until = 0.0  # the whole catalog is cached until then
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, item_id):
+        with self._lock:
+            entry = self._by_id.get(item_id)
+            if entry and entry[1] > self.clock():
+                self._by_id.move_to_end(item_id)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                self._remove(item_id)
+            self.misses += 1
+            return None
+
+    def get_by_name(self, item_name):
+        with self._lock:
+            item_id = self._by_name.get(item_name)
+            if item_id is None:
+                self.misses += 1
+                return None
+            return self.get(item_id)
+
+    def get_many(self, item_ids):
+        # returns (found item_id -> CachedItem, list of missing ids)
+        found, missing = {}, []
+        for item_id in item_ids:
+            item = self.get(item_id)
+            if item:
+                found[item_id] = item
+            else:
+                missing.append(item_id)
+        return found, missing
+
+    def put(self, row):
+        item = CachedItem(*row)
+        with self._lock:
+            old = self._by_id.pop(item.item_id, None)
+            if old and old[0].item_name != item.item_name:
+                self._by_name.pop(old[0].item_name, None)
+            if not old:
+                self._sorted_ids = None
+
+            self._by_id[item.item_id] = (item, self.clock() + self.ttl)
+            self._by_name[item.item_name] = item.item_id
+
+            while len(self._by_id) > self.max_items:
+                oldest = next(iter(self._by_id))
+                self._remove(oldest)
+                self.evictions += 1
+                # a partial catalog can no longer answer full listings
+                self._complete_until = 0.0
+        return item
+
+    def remove(self, item_id):
+        with self._lock:
+            self._remove(item_id)
+
+    def _remove(self, item_id):
+        entry = self._by_id.pop(item_id, None)
+        if entry:
+            self._by_name.pop(entry[0].item_name, None)
+            self._sorted_ids = None
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_name.clear()
+            self._sorted_ids = None
+            self._complete_until = 0.0
+
+    def load_all(self, rows):
+        # replaces the cache with the full catalog, used for complete listings
+        with self._lock:
+            self.clear()
+            for row in rows:
+                self.put(row)
+            if len(rows) <= self.max_items:
+                self._complete_until = self.clock() + self.ttl
+
+    def is_complete(self):
+        with self._lock:
+            return self._complete_until > self.clock()
+
+    def page(self, after_id=None, limit=50):
+        # a keyset page in item_id order, None when the catalog is not fully cached
+        with self._lock:
+            if not self.is_complete():
+                return None
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(self._by_id)
+            start = 0 if after_id is None else bisect_right(self._sorted_ids, after_id)
+            self.hits += 1
+            return [tuple(self._by_id[item_id][0]) for item_id in self._sorted_ids[start:start + limit]]
+
+    def all_items(self):
+        with self._lock:
+            rows = self.page(None, len(self._by_id))
+            return None if rows is None else [CachedItem(*row) for row in rows]
+
+    def apply_change(self, event, payload):
+        # listener for the inventory ChangeNotifier, keeps the cache write-through
+        if event == 'deleted':
+            self.remove(payload)
+        else:
+            self.put(payload)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self._by_id),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'complete': self.is_complete(),
+            }
@@ -1,11 +1,40 @@
+import logging
+
+from sqlalchemy import select
 from database.models import Inventory
+from business.events import ChangeNotifier
+from business.inventory_cache import InventoryCache, CachedItem
+from business.item_search import ItemSearchIndex, DEFAULT_LIMIT
+from business.bulk_import import BulkImporter
+from business.instrumentation import timed
+from business.paging import keyset_page, prefix_filter
+
+logger = logging.getLogger(__name__)
+
+# columns iter_items can sort by, each is backed by an index
+ITEM_ORDERINGS = ('item_id', 'item_name', 'quantity')
+
 
 class InventoryManager:
 
-    def __init__(self, db_session):
+    def __init__(self, db_session, cache=None):
         self.db = db_session
-        print("Inventory Manager initialized successfully!")
+        # 'added' / 'updated' carry an (item_id, item_name, quantity, cost) row, 'deleted' the item_id
+        self.events = ChangeNotifier()
+
+        # read cache, kept write-through by listening to every inventory change
+        self.cache = cache or InventoryCache()
+        self.events.subscribe(self.cache.apply_change)
+
+        # name search index, built the first time somebody searches
+        self.search_index = None
+        logger.info("Inventory Manager initialized")
 
+    @staticmethod
+    def _row(item):
+        return item.item_id, item.item_name, item.quantity, item.cost
+
+    @timed('item.add')
     def add_item(self, item_name, quantity, cost):
         if quantity < 0 or cost < 0:
             raise ValueError("Quantity and cost must be non-negative values.")
@@ -16,66 +45,146 @@ class InventoryManager:
             cost=cost
         )
         try:
-            self.db.session.add(new_item)
-            self.db.session.commit()
-            print(f"Item '{item_name}' added successfully!")
+            with self.db.session_scope() as session:
+                session.add(new_item)
+            logger.debug("Item '%s' added", item_name)
+            self.events.publish('added', self._row(new_item))
             return new_item
-        except Exception as e:
-            self.db.session.rollback()
-            print(f"Error while adding item: {e}")
+        except Exception:
+            logger.exception("Error while adding item '%s'", item_name)
             return None
 
+    @timed('item.update')
     def update_quantity(self, item_id, new_quantity):
         if new_quantity < 0:
             raise ValueError("Quantity must be a non-negative value.")
 
-        item = self.db.session.query(Inventory).filter_by(item_id=item_id).first()
-
-        if item:
-            item.quantity = new_quantity
-            try:
-                self.db.session.commit()
-                print(f"Quantity of item '{item.item_name}' updated to {new_quantity}.")
-                return True
-            except Exception as e:
-                self.db.session.rollback()
-                print(f"Error while updating quantity: {e}")
-                return False
-        else:
-            print(f"Item with ID {item_id} not found.")
+        try:
+            with self.db.session_scope() as session:
+                item = session.get(Inventory, item_id)
+
+                if not item:
+                    logger.info("Item with ID %s not found", item_id)
+                    return False
+
+                item.quantity = new_quantity
+            logger.debug("Quantity of item '%s' updated to %s", item.item_name, new_quantity)
+            self.events.publish('updated', self._row(item))
+            return True
+        except Exception:
+            logger.exception("Error while updating the quantity of item %s", item_id)
             return False
 
+    @timed('item.delete')
     def delete_item(self, item_id):
-        item = self.db.session.query(Inventory).filter_by(item_id=item_id).first()
-
-        if item:
-            try:
-                self.db.session.delete(item)  # Delete the item from the database
-                self.db.session.commit()  # Commit the transaction
-                print(f"Item with ID {item_id} deleted successfully.")
-                return True
-            except Exception as e:
-                self.db.session.rollback()  # Rollback in case of an error
-                print(f"Error while deleting item: {e}")
-                return False
-        else:
-            print(f"Item with ID {item_id} not found.")
+        try:
+            with self.db.session_scope() as session:
+                item = session.get(Inventory, item_id)
+
+                if not item:
+                    logger.info("Item with ID %s not found", item_id)
+                    return False
+
+                session.delete(item)  # Delete the item from the database
+            logger.debug("Item with ID %s deleted", item_id)
+            self.events.publish('deleted', item_id)
+            return True
+        except Exception:
+            logger.exception("Error while deleting item %s", item_id)
             return False
 
+    @timed('item.import')
+    def import_file(self, path, fmt=None, mode='catalog', dry_run=False):
+        # bulk catalog import or stock-take, changed items reach the cache and windows as events
+        report = BulkImporter(self.db, events=self.events).import_file(path, fmt=fmt, mode=mode, dry_run=dry_run)
+        logger.info(report.summary())
+        return report
+
+    @timed('item.list')
     def get_all_items(self):
-        items = self.db.session.query(Inventory).all()
-        if items:
-            print(f"Retrieved {len(items)} item(s) from inventory.")
-            return items
-        else:
-            print("No items found in inventory.")
-            return []
+        items = self.cache.all_items()
+        if items is None:
+            with self.db.session_scope() as session:
+                rows = session.execute(
+                    select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+                    .order_by(Inventory.item_id)
+                ).all()
+            self.cache.load_all(rows)
+            items = self.cache.all_items() or [CachedItem(*row) for row in rows]
+
+        logger.debug("Retrieved %d item(s) from inventory", len(items))
+        return items
+
+    def get_items(self, item_ids):
+        # item_id -> CachedItem for the given ids, only the cache misses go to the database
+        found, missing = self.cache.get_many(item_ids)
+        if missing:
+            with self.db.session_scope() as session:
+                rows = session.execute(
+                    select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+                    .where(Inventory.item_id.in_(missing))
+                ).all()
+            for row in rows:
+                found[row.item_id] = self.cache.put(row)
+        return found
+
+    def items_query(self, after=None, limit=50, name_prefix=None, min_qty=None, max_qty=None,
+                    order_by='item_id'):
+        if order_by not in ITEM_ORDERINGS:
+            raise ValueError(f"Items can only be ordered by {', '.join(ITEM_ORDERINGS)}.")
+        column = getattr(Inventory, order_by)
+
+        statement = select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+        if name_prefix:
+            statement = prefix_filter(statement, Inventory.item_name, name_prefix)
+        if min_qty is not None:
+            statement = statement.where(Inventory.quantity >= min_qty)
+        if max_qty is not None:
+            statement = statement.where(Inventory.quantity <= max_qty)
+        return keyset_page(statement, column, Inventory.item_id, after, limit)
+
+    def iter_items(self, after=None, limit=50, name_prefix=None, min_qty=None, max_qty=None,
+                   order_by='item_id'):
+        """
+        Returns one page of (item_id, item_name, quantity, cost) tuples that come after
+        the cursor in order_by order. The cursor for the next page is
+        page_cursor(last_row, ITEM_ORDERINGS.index(order_by)), which is simply the last
+        item_id when ordering by id. Each page costs the same however deep into the
+        catalog it is.
+        """
+        # the plain catalog listing is served from the cache once it holds every item
+        if name_prefix is None and min_qty is None and max_qty is None and order_by == 'item_id':
+            page = self.cache.page(after, limit)
+            if page is not None:
+                return page
+
+        statement = self.items_query(after, limit, name_prefix, min_qty, max_qty, order_by)
+        with self.db.session_scope() as session:
+            return [tuple(row) for row in session.execute(statement)]
+
+    @timed('item.search')
+    def search_items(self, query, limit=DEFAULT_LIMIT):
+        # type-ahead search over item names, returns CachedItem rows best match first
+        if self.search_index is None:
+            index = ItemSearchIndex()
+            index.build((item.item_id, item.item_name) for item in self.get_all_items())
+            self.events.subscribe(index.apply_change)
+            self.search_index = index
+
+        item_ids = self.search_index.search(query, limit)
+        items = self.get_items(item_ids)
+        return [items[item_id] for item_id in item_ids if item_id in items]
 
     def get_item_by_name(self, item_name):
-        item = self.db.session.query(Inventory).filter_by(item_name=item_name).first()
-        if item:
-            print(f"Item found: {item_name}")
-            return item
-        else:
-            print(f"Item '{item_name}' not found.")
-            return None
+        item = self.cache.get_by_name(item_name)
+        if item is None:
+            with self.db.session_scope() as session:
+                row = session.execute(
+                    select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+                    .where(Inventory.item_name == item_name)
+                ).first()
+            item = self.cache.put(row) if row else None
+
+        if item is None:
+            logger.debug("Item '%s' not found", item_name)
+        return item
@@ -0,0 +1,165 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+# most results a type-ahead lookup returns
+DEFAULT_LIMIT = 20
+
+# share of a misspelt word's trigrams a known word must have to replace it
+FUZZY_THRESHOLD = 0.5
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _WORD.findall(text.lower())
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ItemSearchIndex:
+    """
+    In-memory type-ahead index over item names.
+
+    Items are numbered in result order (shortest name first) and every distinct word
+    keeps a bitset, a Python int with bit n set when item number n uses the word.
+    A query word is a prefix range over the sorted vocabulary, whose bitsets are OR-ed
+    together; the words of a query are AND-ed and the lowest set bits are the best
+    matches. All of that is done by C-level big integer operations, so a lookup costs
+    roughly the same on a 50k item catalog as on a small one.
+
+    A query word no name contains is swapped for the closest known word by trigram
+    overlap, so "flat whte" still finds "Flat White".
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._names = {}  # item_id -> name
+        self._words = {}  # item_id -> tuple of distinct words
+        self._rank = {}  # item_id -> bit number
+        self._items = []  # bit number -> item_id, None once removed
+        self._bits = {}  # word -> bitset of items using it
+        self._vocabulary = []  # sorted words
+        self._trigrams = {}  # trigram -> set of words
+
+    def build(self, items):
+        # items are (item_id, item_name) pairs
+        with self._lock:
+            self._names = {item_id: name for item_id, name in items}
+            self._words = {item_id: tuple(dict.fromkeys(tokenize(name))) for item_id, name in self._names.items()}
+            self._items = sorted(self._names, key=lambda item_id: (len(self._names[item_id]), self._names[item_id]))
+            self._rank = {item_id: rank for rank, item_id in enumerate(self._items)}
+
+            # bitsets are assembled in byte arrays, setting bits on an int one by one is quadratic
+            size = (len(self._items) + 7) // 8
+            buffers = {}
+            for item_id, words in self._words.items():
+                rank = self._rank[item_id]
+                for word in words:
+                    buffer = buffers.get(word)
+                    if buffer is None:
+                        buffer = buffers[word] = bytearray(size)
+                    buffer[rank >> 3] |= 1 << (rank & 7)
+            self._bits = {word: int.from_bytes(buffer, 'little') for word, buffer in buffers.items()}
+
+            self._vocabulary = sorted(self._bits)
+            self._trigrams = {}
+            for word in self._vocabulary:
+                for gram in trigrams(word):
+                    self._trigrams.setdefault(gram, set()).add(word)
+
+    def add(self, item_id, name):
+        # new items rank after the existing ones until the next build
+        with self._lock:
+            if item_id in self._names:
+                if self._names[item_id] == name:
+                    return
+                self.remove(item_id)
+
+            rank = len(self._items)
+            self._items.append(item_id)
+            self._rank[item_id] = rank
+            self._names[item_id] = name
+            self._words[item_id] = tuple(dict.fromkeys(tokenize(name)))
+            for word in self._words[item_id]:
+                if word not in self._bits:
+                    self._bits[word] = 0
+                    insort(self._vocabulary, word)
+                    for gram in trigrams(word):
+                        self._trigrams.setdefault(gram, set()).add(word)
+                self._bits[word] |= 1 << rank
+
+    def remove(self, item_id):
+        with self._lock:
+            if item_id not in self._names:
+                return
+            rank = self._rank.pop(item_id)
+            self._items[rank] = None
+            del self._names[item_id]
+            for word in self._words.pop(item_id):
+                self._bits[word] &= ~(1 << rank)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _prefix_bits(self, prefix):
+        # bitset of every item with a word starting with prefix
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + '\U0010ffff', start)
+        bits = 0
+        for word in self._vocabulary[start:end]:
+            bits |= self._bits[word]
+        return bits, end > start
+
+    def closest_word(self, word):
+        # the known word sharing the most trigrams with word, or None if nothing is close
+        grams = trigrams(word)
+        scores = {}
+        for gram in grams:
+            for known in self._trigrams.get(gram, ()):
+                scores[known] = scores.get(known, 0) + 1
+        if not scores:
+            return None
+        best = max(scores, key=lambda known: (scores[known], -abs(len(known) - len(word))))
+        return best if scores[best] >= len(grams) * FUZZY_THRESHOLD else None
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Returns up to limit item ids whose names contain every word of query as a word
+        prefix, shortest names first.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+
+        with self._lock:
+            matches = -1
+            for word in words:
+                bits, known = self._prefix_bits(word)
+                if not known:
+                    # no name has this word, try the nearest spelling instead
+                    word = self.closest_word(word)
+                    if word is None:
+                        return []
+                    bits, _ = self._prefix_bits(word)
+                matches &= bits
+                if not matches:
+                    return []
+
+            # lowest set bits first, they are the best ranked items
+            results = []
+            while matches and len(results) < limit:
+                lowest = matches & -matches
+                results.append(self._items[lowest.bit_length() - 1])
+                matches ^= lowest
+            return results
+
+    def apply_change(self, event, payload):
+        # listener for the inventory ChangeNotifier
+        if event == 'deleted':
+            self.remove(payload)
+        else:
+            self.add(payload[0], payload[1])
@@ -0,0 +1,59 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, job_id, name):
+        self.job_id = job_id
+        self.name = name
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        # cooperative, the job stops the next time it calls check()
+        self._cancelled.set()
+        if self.future:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        # called by long running jobs between rows
+        if self._cancelled.is_set():
+            raise JobCancelled(f"Job '{self.name}' was cancelled")
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        # only call once done() is true, re-raises whatever the job raised
+        return self.future.result()
+
+
+class JobRunner:
+    """
+    Runs background work (reports, exports, password hashing) on a small thread pool so
+    the Tk main loop never blocks. Jobs get increasing ids so callers can tell a stale
+    result from the one they are waiting for.
+    """
+
+    def __init__(self, max_workers=2, name='job'):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._ids = itertools.count(1)
+
+    def submit(self, name, fn, *args, **kwargs):
+        # fn is called as fn(job, *args, **kwargs) on a worker thread
+        job = Job(next(self._ids), name)
+        job.future = self.executor.submit(fn, job, *args, **kwargs)
+        return job
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,33 @@
+from sqlalchemy import tuple_
+
+# appended to a prefix to get the end of its range, the largest unicode code point
+PREFIX_END = '\U0010ffff'
+
+
+def prefix_filter(statement, column, prefix):
+    # a range on the column's index instead of a LIKE scan (case-sensitive)
+    return statement.where(column >= prefix, column < prefix + PREFIX_END)
+
+
+def keyset_page(statement, column, id_column, after=None, limit=50):
+    """
+    Orders statement by column (then id_column, so the boundary is stable with
+    duplicates) and limits it to the page that follows the cursor after. The cursor
+    is page_cursor() of the last row of the previous page: the id when ordering by
+    the id, otherwise the (sort value, id) pair, so the next page does not depend on
+    that row still existing.
+    """
+    if column is id_column:
+        if after is not None:
+            statement = statement.where(id_column > (after[-1] if isinstance(after, tuple) else after))
+        return statement.order_by(id_column).limit(limit)
+
+    if after is not None:
+        value, last_id = after
+        statement = statement.where(tuple_(column, id_column) > tuple_(value, last_id))
+    return statement.order_by(column, id_column).limit(limit)
+
+
+def page_cursor(row, position):
+    # cursor for the page after row, position is the index of the sort column in the row
+    return row[0] if position == 0 else (row[position], row[0])
@@ -0,0 +1,176 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# defaults, see benchmarks/calibrate_password_hash.py to pick values for a host
+PBKDF2_ITERATIONS = 600_000
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+SALT_BYTES = 16
+
+# successful verifications remembered so a repeated login skips the KDF
+VERIFY_CACHE_SIZE = 128
+VERIFY_CACHE_TTL = 300
+
+
+class Pbkdf2Hasher:
+    """pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>"""
+
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def _derive(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        derived = self._derive(password, salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt.hex()}${derived.hex()}"
+
+    def verify(self, password, encoded):
+        _, iterations, salt, expected = encoded.split('$')
+        derived = self._derive(password, bytes.fromhex(salt), int(iterations))
+        return hmac.compare_digest(derived, bytes.fromhex(expected))
+
+    def needs_rehash(self, encoded):
+        return int(encoded.split('$')[1]) != self.iterations
+
+
+class ScryptHasher:
+    """scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>"""
+
+    algorithm = 'scrypt'
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    @staticmethod
+    def _derive(password, salt, n, r, p):
+        # scrypt needs about 128 * n * r bytes, allow twice that
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024,
+                              dklen=32)
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        derived = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.algorithm}${self.n}${self.r}${self.p}${salt.hex()}${derived.hex()}"
+
+    def verify(self, password, encoded):
+        _, n, r, p, salt, expected = encoded.split('$')
+        derived = self._derive(password, bytes.fromhex(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(derived, bytes.fromhex(expected))
+
+    def needs_rehash(self, encoded):
+        return tuple(map(int, encoded.split('$')[1:4])) != (self.n, self.r, self.p)
+
+
+class LegacySha256Hasher:
+    """<salt hex>$<sha256 hex>, the original format. Only verified, never written."""
+
+    algorithm = 'sha256'
+
+    def verify(self, password, encoded):
+        salt, expected = encoded.split('$')
+        computed = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(computed, expected)
+
+    def needs_rehash(self, encoded):
+        return True
+
+
+class PasswordHasher:
+    """
+    Hashes new passwords with one KDF and verifies stored hashes of any supported
+    kind, telling the caller when a stored hash should be replaced because it uses
+    another algorithm or older parameters.
+
+    Successful verifications are remembered for a short while under an HMAC of the
+    stored hash and the password with a key that never leaves the process, so logging
+    in again does not pay for the KDF twice. A changed password changes the stored
+    hash and so never matches an old entry.
+    """
+
+    def __init__(self, hasher=None, cache_size=VERIFY_CACHE_SIZE, cache_ttl=VERIFY_CACHE_TTL,
+                 clock=time.monotonic):
+        self.hasher = hasher or ScryptHasher()
+        self.hashers = {h.algorithm: h for h in (Pbkdf2Hasher(), ScryptHasher())}
+        self.hashers[self.hasher.algorithm] = self.hasher
+        self.legacy = LegacySha256Hasher()
+
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.clock = clock
+        self._cache_key = os.urandom(32)
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self.hasher.hash(password)
+
+    def _hasher_for(self, encoded):
+        algorithm, _, _ = encoded.partition('$')
+        hasher = self.hashers.get(algorithm)
+        if hasher is None and encoded.count('$') == 1:
+            hasher = self.legacy
+        if hasher is None:
+            raise ValueError(f"Unsupported password hash format '{algorithm}'.")
+        return hasher
+
+    def needs_rehash(self, encoded):
+        hasher = self._hasher_for(encoded)
+        return hasher is not self.hasher or hasher.needs_rehash(encoded)
+
+    def _remembered(self, key):
+        with self._lock:
+            expires = self._verified.get(key)
+            if expires is None:
+                return False
+            if expires < self.clock():
+                del self._verified[key]
+                return False
+            return True
+
+    def _remember(self, key):
+        if not self.cache_size:
+            return
+        with self._lock:
+            self._verified[key] = self.clock() + self.cache_ttl
+            self._verified.move_to_end(key)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+    def verify(self, password, encoded):
+        """
+        Checks password against a stored hash. Returns (matches, needs_rehash), where
+        needs_rehash means the caller should store hash(password) in its place.
+        """
+        try:
+            hasher = self._hasher_for(encoded)
+        except ValueError:
+            return False, False
+
+        key = hmac.new(self._cache_key, f"{encoded}\0{password}".encode(), hashlib.sha256).digest()
+        if self._remembered(key):
+            return True, False
+
+        try:
+            matches = hasher.verify(password, encoded)
+        except ValueError:
+            # a corrupt stored hash never matches
+            return False, False
+        if not matches:
+            return False, False
+
+        rehash = self.needs_rehash(encoded)
+        if not rehash:
+            self._remember(key)
+        return True, rehash
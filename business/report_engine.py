@@ -0,0 +1,134 @@
+import heapq
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from database.models import Sale, Inventory, DailySalesSummary, ItemSalesDaily
+
+LOW_STOCK_THRESHOLD = 10
+
+# rows fetched from sqlite per round trip while a report streams
+STREAM_BATCH_SIZE = 500
+
+
+class ReportEngine:
+    """
+    Runs the report queries with the aggregation done inside SQLite.
+    Every method returns plain tuples, the windows only format them.
+    """
+
+    def __init__(self, db_handler):
+        self.db = db_handler
+
+    # query builders, kept separate so the query plans can be checked
+
+    def daily_sales_query(self, day):
+        return (select(Sale.sale_id, Sale.date, Sale.total_amount)
+                .where(Sale.date == day)
+                .order_by(Sale.sale_id))
+
+    def sales_by_day_query(self, start):
+        # reads the daily rollup, one row per day and user instead of one per sale
+        return (select(DailySalesSummary.date, func.sum(DailySalesSummary.revenue),
+                       func.sum(DailySalesSummary.sale_count))
+                .where(DailySalesSummary.date >= start)
+                .group_by(DailySalesSummary.date)
+                .order_by(DailySalesSummary.date))
+
+    def inventory_status_query(self):
+        return (select(Inventory.item_name, Inventory.quantity, Inventory.cost,
+                       Inventory.quantity * Inventory.cost)
+                .order_by(Inventory.item_id))
+
+    def inventory_value_query(self):
+        return select(func.coalesce(func.sum(Inventory.quantity * Inventory.cost), 0))
+
+    def low_stock_query(self, threshold):
+        return (select(Inventory.item_name, Inventory.quantity, threshold - Inventory.quantity)
+                .where(Inventory.quantity < threshold)
+                .order_by(Inventory.quantity))
+
+    def item_velocity_query(self, start, sold_only=False):
+        # units and revenue per item from the per-item rollup, unsold items included with 0
+        # unless sold_only
+        sold = (select(ItemSalesDaily.item_id,
+                       func.sum(ItemSalesDaily.units_sold).label('units_sold'),
+                       func.sum(ItemSalesDaily.revenue).label('revenue'))
+                .where(ItemSalesDaily.date >= start)
+                .group_by(ItemSalesDaily.item_id)
+                .subquery())
+        statement = select(Inventory.item_id, Inventory.item_name,
+                           func.coalesce(sold.c.units_sold, 0), func.coalesce(sold.c.revenue, 0))
+        if sold_only:
+            return statement.join(sold, sold.c.item_id == Inventory.item_id).where(sold.c.units_sold > 0)
+        return statement.outerjoin(sold, sold.c.item_id == Inventory.item_id)
+
+    def queries(self):
+        # every report query with representative arguments
+        today = datetime.now().date()
+        return [
+            ("daily sales", self.daily_sales_query(today)),
+            ("sales by day", self.sales_by_day_query(today.replace(day=1))),
+            ("inventory status", self.inventory_status_query()),
+            ("inventory value", self.inventory_value_query()),
+            ("low stock", self.low_stock_query(LOW_STOCK_THRESHOLD)),
+            ("item velocity", self.item_velocity_query(today - timedelta(days=30))),
+        ]
+
+    def stream(self, statement, batch_size=STREAM_BATCH_SIZE):
+        # yields rows as plain tuples while the cursor is still open, memory stays
+        # at one batch however large the result is
+        with self.db.session_scope() as session:
+            for row in session.execute(statement.execution_options(yield_per=batch_size)):
+                yield tuple(row)
+
+    # reports, the row-per-record ones are generators
+
+    def daily_sales(self, day=None):
+        # (sale_id, date, total_amount) for every sale on the day
+        return self.stream(self.daily_sales_query(day or datetime.now().date()))
+
+    def monthly_sales(self, today=None):
+        # (date, revenue, sale_count) per day since the first of the month
+        today = today or datetime.now().date()
+        return self.stream(self.sales_by_day_query(today.replace(day=1)))
+
+    def inventory_status(self):
+        # (item_name, quantity, cost, value) per item
+        return self.stream(self.inventory_status_query())
+
+    def inventory_value(self):
+        with self.db.session_scope() as session:
+            return session.execute(self.inventory_value_query()).scalar()
+
+    def low_stock(self, threshold=LOW_STOCK_THRESHOLD):
+        # (item_name, quantity, reorder_quantity) for items under the threshold
+        return self.stream(self.low_stock_query(threshold))
+
+    def revenue_analysis(self, today=None, days=30):
+        # (daily rows of (date, revenue), total revenue, average daily revenue)
+        today = today or datetime.now().date()
+        daily = self.sales_by_day_query(today - timedelta(days=days)).subquery()
+        revenue = daily.c[1]
+
+        with self.db.session_scope() as session:
+            rows = [(row[0], row[1]) for row in session.execute(select(daily))]
+            total, average = session.execute(
+                select(func.coalesce(func.sum(revenue), 0), func.coalesce(func.avg(revenue), 0))
+            ).one()
+        return rows, total, average
+
+    def top_sellers(self, limit=10, days=30, today=None):
+        # (item_id, item_name, units_sold, revenue, units_per_day) for the fastest movers,
+        # only items that sold in the period
+        return self._item_velocity(heapq.nlargest, limit, days, today, sold_only=True)
+
+    def slow_movers(self, limit=10, days=30, today=None):
+        # same columns for the slowest movers, items that never sold come first
+        return self._item_velocity(heapq.nsmallest, limit, days, today)
+
+    def _item_velocity(self, select_n, limit, days, today, sold_only=False):
+        today = today or datetime.now().date()
+        with self.db.session_scope() as session:
+            rows = session.execute(self.item_velocity_query(today - timedelta(days=days), sold_only))
+            # bounded heap of size limit instead of sorting every item
+            best = select_n(limit, rows, key=lambda row: (row[2], row[3]))
+        return [(item_id, name, units, revenue, units / days) for item_id, name, units, revenue in best]
@@ -0,0 +1,137 @@
+from datetime import datetime
+from itertools import islice
+
+from business.report_engine import LOW_STOCK_THRESHOLD
+from business.instrumentation import metrics
+
+# lines joined into one chunk for the text widget or an export file
+LINES_PER_CHUNK = 200
+
+SEPARATOR = "-" * 40
+
+
+class ReportFormatter:
+    """
+    Turns report rows into text as a stream of lines. Nothing is built up in memory,
+    rows are formatted as they come off the database cursor.
+    """
+
+    def __init__(self, report_engine):
+        self.engine = report_engine
+        self.reports = {
+            "Daily Sales": self.daily_sales,
+            "Monthly Sales": self.monthly_sales,
+            "Inventory Status": self.inventory_status,
+            "Low Stock Alert": self.low_stock,
+            "Revenue Analysis": self.revenue_analysis,
+            "Top Sellers": lambda: self.item_velocity("Top Sellers", self.engine.top_sellers(10, days=30)),
+            "Slow Movers": lambda: self.item_velocity("Slow Movers", self.engine.slow_movers(10, days=30)),
+        }
+
+    def report_types(self):
+        return list(self.reports)
+
+    def lines(self, report_type):
+        # timed as report.<name> until the last line is produced, the report streams lazily
+        with metrics.span("report." + report_type.lower().replace(' ', '_')):
+            yield from self.reports[report_type]()
+
+    def chunks(self, report_type, lines_per_chunk=LINES_PER_CHUNK):
+        # groups lines into text chunks, each ends with a newline
+        lines = self.lines(report_type)
+        while True:
+            batch = list(islice(lines, lines_per_chunk))
+            if not batch:
+                return
+            yield "\n".join(batch) + "\n"
+
+    def write(self, report_type, file, check=None):
+        # streams the report into an open text file, check() is called between chunks
+        for chunk in self.chunks(report_type):
+            if check:
+                check()
+            file.write(chunk)
+
+    def daily_sales(self):
+        today = datetime.now().date()
+        yield f"Daily Sales Report - {today}"
+        yield ""
+
+        total_revenue = 0
+        for sale_id, sale_date, amount in self.engine.daily_sales(today):
+            yield f"Sale ID: {sale_id}"
+            yield f"Time: {sale_date}"
+            yield f"Amount: GBP{amount:.2f}"
+            yield SEPARATOR
+            total_revenue += amount
+
+        yield ""
+        yield f"Total Daily Revenue: GBP {total_revenue:.2f}"
+
+    def monthly_sales(self):
+        today = datetime.now().date()
+        yield f"Monthly Sales Report - {today.strftime('%B %Y')}"
+        yield ""
+
+        total_revenue = 0
+        for date, amount, _ in self.engine.monthly_sales(today):
+            yield f"{date.strftime('%Y-%m-%d')}: GBP {amount:.2f}"
+            total_revenue += amount
+
+        yield ""
+        yield f"Total Monthly Revenue: GBP {total_revenue:.2f}"
+
+    def inventory_status(self):
+        yield "Current Inventory Status"
+        yield ""
+
+        for item_name, quantity, cost, value in self.engine.inventory_status():
+            yield f"Item: {item_name}"
+            yield f"Quantity: {quantity}"
+            yield f"Unit Cost: GBP {cost:.2f}"
+            yield f"Total Value: GBP {value:.2f}"
+            yield SEPARATOR
+
+        yield ""
+        yield f"Total Inventory Value: GBP {self.engine.inventory_value():.2f}"
+
+    def low_stock(self):
+        yield "Low Stock Alert Report"
+        yield ""
+
+        empty = True
+        for item_name, quantity, reorder in self.engine.low_stock(LOW_STOCK_THRESHOLD):
+            empty = False
+            yield f"Item: {item_name}"
+            yield f"Current Quantity: {quantity}"
+            yield f"Reorder Suggested: {reorder} units"
+            yield SEPARATOR
+
+        if empty:
+            yield "No items are running low on stock."
+
+    def revenue_analysis(self):
+        daily_revenue, total_revenue, avg_daily_revenue = self.engine.revenue_analysis(days=30)
+
+        yield "Revenue Analysis (Last 30 Days)"
+        yield ""
+        yield f"Total Revenue: GBP {total_revenue:.2f}"
+        yield f"Average Daily Revenue: GBP {avg_daily_revenue:.2f}"
+        yield ""
+        yield "Daily Breakdown:"
+
+        for date, amount in daily_revenue:
+            yield f"{date.strftime('%Y-%m-%d')}: GBP {amount:.2f}"
+
+    def item_velocity(self, title, items):
+        yield f"{title} (Last 30 Days)"
+        yield ""
+
+        if not items:
+            yield "No items in inventory."
+
+        for rank, (item_id, item_name, units, revenue, per_day) in enumerate(items, start=1):
+            yield f"{rank}. {item_name} (ID {item_id})"
+            yield f"Units Sold: {units} ({per_day:.1f} per day)"
+            yield f"Revenue: GBP {revenue:.2f}"
+            yield SEPARATOR
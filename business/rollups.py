@@ -0,0 +1,106 @@
+import logging
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database.models import DailySalesSummary, Inventory, ItemSalesDaily, Sale, SaleItem
+
+logger = logging.getLogger(__name__)
+
+# sales without a user are rolled up under this id
+NO_USER = 0
+
+
+def rebuild_daily_sales(connection):
+    # recomputes daily_sales_summary from the raw sales tables in one INSERT ... SELECT
+    units = (select(SaleItem.sale_id, func.sum(SaleItem.quantity).label('units'))
+             .group_by(SaleItem.sale_id)
+             .subquery())
+    user_id = func.coalesce(Sale.user_id, NO_USER)
+
+    connection.execute(delete(DailySalesSummary))
+    connection.execute(insert(DailySalesSummary).from_select(
+        ['date', 'user_id', 'revenue', 'sale_count', 'units_sold'],
+        select(Sale.date, user_id, func.sum(Sale.total_amount), func.count(Sale.sale_id),
+               func.coalesce(func.sum(units.c.units), 0))
+        .outerjoin(units, units.c.sale_id == Sale.sale_id)
+        .group_by(Sale.date, user_id)
+    ))
+
+
+def rebuild_item_sales(connection):
+    # recomputes item_sales_daily from the sale lines, revenue uses the item's current cost;
+    # lines whose item was removed (item_id NULL) have no row to roll up under
+    connection.execute(delete(ItemSalesDaily))
+    connection.execute(insert(ItemSalesDaily).from_select(
+        ['date', 'item_id', 'units_sold', 'revenue'],
+        select(Sale.date, SaleItem.item_id, func.sum(SaleItem.quantity),
+               func.sum(SaleItem.quantity * func.coalesce(Inventory.cost, 0)))
+        .join(Sale, Sale.sale_id == SaleItem.sale_id)
+        .outerjoin(Inventory, Inventory.item_id == SaleItem.item_id)
+        .where(SaleItem.item_id.isnot(None))
+        .group_by(Sale.date, SaleItem.item_id)
+    ))
+
+
+def _daily_sales_upsert():
+    table = DailySalesSummary.__table__
+    statement = sqlite_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.date, table.c.user_id],
+        set_={
+            'revenue': table.c.revenue + statement.excluded.revenue,
+            'sale_count': table.c.sale_count + statement.excluded.sale_count,
+            'units_sold': table.c.units_sold + statement.excluded.units_sold,
+        }
+    )
+
+
+def _item_sales_upsert():
+    table = ItemSalesDaily.__table__
+    statement = sqlite_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.date, table.c.item_id],
+        set_={
+            'units_sold': table.c.units_sold + statement.excluded.units_sold,
+            'revenue': table.c.revenue + statement.excluded.revenue,
+        }
+    )
+
+
+# Core statements built once, checkout runs them on the session's connection with
+# bound parameters so they compile once and come from the statement cache afterwards
+DAILY_SALES_UPSERT = _daily_sales_upsert()
+ITEM_SALES_UPSERT = _item_sales_upsert()
+
+
+class SalesRollup:
+
+    def __init__(self, db_handler):
+        self.db = db_handler
+
+    def record_sale(self, session, sale_date, user_id, revenue, units_sold):
+        # adds one sale to its day's totals, runs inside the checkout transaction
+        session.connection().execute(DAILY_SALES_UPSERT, {
+            'date': sale_date, 'user_id': user_id if user_id is not None else NO_USER,
+            'revenue': revenue, 'sale_count': 1, 'units_sold': units_sold
+        })
+
+    def record_item_sales(self, session, sale_date, lines):
+        # adds (item_id, units, revenue) lines to the per-item daily totals in one executemany
+        if not lines:
+            return
+
+        session.connection().execute(ITEM_SALES_UPSERT, [
+            {'date': sale_date, 'item_id': item_id, 'units_sold': units, 'revenue': revenue}
+            for item_id, units, revenue in lines
+        ])
+
+    def rebuild(self):
+        # full backfill, used after imports or if the rollups are ever suspected to drift
+        with self.db.session_scope() as session:
+            rebuild_daily_sales(session)
+            rebuild_item_sales(session)
+            days = session.execute(select(func.count()).select_from(DailySalesSummary)).scalar()
+            item_days = session.execute(select(func.count()).select_from(ItemSalesDaily)).scalar()
+        logger.info("Sales rollups rebuilt with %d daily and %d per-item row(s)", days, item_days)
+        return days, item_days
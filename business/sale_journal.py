@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+from database.models import JournalCheckpoint
+from business.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# most journalled sales written to the database in one transaction
+GROUP_COMMIT_SIZE = 200
+
+# seconds between attempts while a journalled sale cannot be saved, e.g. the database stays locked
+RETRY_DELAY = 1.0
+
+# what create_sale returns in write-behind mode, the sale itself is written later
+QueuedSale = namedtuple('QueuedSale', ['seq', 'user_id', 'date', 'items'])
+
+
+class SaleJournal:
+    """
+    Append-only JSON Lines file of completed sales. A record is flushed and fsynced
+    before append returns, so a sale the cashier has seen complete survives a crash
+    even if it never reached the database. A record half written when the process died
+    is cut off the next time the journal is opened.
+
+    The first line is a header with a random journal id, which names the journal's
+    checkpoint in the database. Tills sharing one database each have their own.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.name = os.path.basename(path)
+        # sales the database refused, kept so they can be looked at and entered by hand
+        self.failed_path = path + '.failed'
+        self.fsync = fsync
+        self.journal_id, self.last_seq = self._recover()
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        if self.journal_id is None:
+            self.journal_id = uuid.uuid4().hex
+            self._write_header()
+
+    def _recover(self):
+        # returns (journal id, last sequence number), dropping a torn record at the end of the file
+        last_seq = 0
+        journal_id = None
+        if not os.path.exists(self.path):
+            return journal_id, last_seq
+
+        good_until = 0
+        with open(self.path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if good_until == 0 and 'journal' in entry:
+                    journal_id = entry['journal']
+                elif 'seq' in entry:
+                    last_seq = entry['seq']
+                else:
+                    break
+                good_until += len(line)
+        if good_until < os.path.getsize(self.path):
+            logger.warning("Sale journal %s: dropped an incomplete record at the end of the file", self.name)
+            os.truncate(self.path, good_until)
+        if journal_id is None and good_until:
+            # written before journals had a header, its checkpoint is under the file name
+            journal_id = self.name
+        return journal_id, last_seq
+
+    def _write_header(self):
+        self._file.write(json.dumps({'journal': self.journal_id}) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, user_id, quantities, sale_date=None):
+        with self._lock:
+            self.last_seq += 1
+            record = QueuedSale(self.last_seq, user_id, (sale_date or date.today()).isoformat(),
+                                sorted(quantities.items()))
+            self._file.write(json.dumps(record._asdict()) + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            return record
+
+    def records(self, after_seq=0):
+        # every record with a sequence number above after_seq, in order
+        with self._lock:
+            self._file.flush()
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                entry = json.loads(line)
+                if 'seq' in entry and entry['seq'] > after_seq:
+                    yield QueuedSale(**entry)
+
+    def set_aside(self, record, error):
+        entry = dict(record._asdict(), error=str(error))
+        with self._lock, open(self.failed_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+    def truncate(self):
+        # forgets every record, only safe once all of them are in the database
+        with self._lock:
+            self._file.truncate(0)
+            self._write_header()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class WriteBehindWriter:
+    """
+    Drains journalled sales into the database on a background thread. Whatever queued
+    up while the previous transaction was committing goes into the next one, up to
+    GROUP_COMMIT_SIZE sales per commit, together with the sequence number of the last
+    record applied. On start the records after that checkpoint are replayed, so a sale
+    is applied exactly once even across a crash.
+
+    A sale is only checkpointed once it is in the database or, if the database
+    refuses it outright, copied to the journal's .failed file. Lines a saved sale had
+    to leave out, e.g. for lack of stock, are copied there too under the sale's
+    sequence number, since the cashier was already told they sold. While the database
+    is busy or unavailable the writer keeps retrying; a sale still unsaved at close
+    stays in the journal and is replayed on the next start.
+
+    Stock changes are collected rather than published from the writer thread, since
+    windows listen on the inventory events; SalesManager.publish_applied hands them
+    over on the Tk thread.
+    """
+
+    def __init__(self, sales_manager, journal, batch_size=GROUP_COMMIT_SIZE):
+        self.sales = sales_manager
+        self.db = sales_manager.db
+        self.journal = journal
+        self.batch_size = batch_size
+
+        self.applied_seq = 0
+        self.applied = 0
+        self.batches = 0
+        self.stock_changes = queue.Queue()
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closing = threading.Event()
+
+    def start(self):
+        with self.db.session_scope() as session:
+            self.applied_seq = session.execute(
+                select(JournalCheckpoint.last_seq).where(JournalCheckpoint.journal == self.journal.journal_id)
+            ).scalar() or 0
+
+        # numbering carries on from the checkpoint when the journal was truncated
+        self.journal.last_seq = max(self.journal.last_seq, self.applied_seq)
+
+        pending = list(self.journal.records(self.applied_seq))
+        if pending:
+            logger.warning("Replaying %d journalled sale(s) from %s", len(pending), self.journal.name)
+        for record in pending:
+            self._queue.put(record)
+
+        self._thread = threading.Thread(target=self._run, name='sale-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, quantities):
+        # durable once this returns, the database write happens in the background
+        record = self.journal.append(user_id, quantities)
+        self._queue.put(record)
+        return record
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                self._queue.task_done()
+                return
+
+            # group commit: everything that queued up meanwhile goes in the same transaction
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+
+            if not self._apply(batch):
+                # closed while retrying, what is left is replayed from the journal next time
+                return
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _apply(self, batch):
+        # True once every record is saved or set aside, False if closed before that
+        try:
+            self.sales.reservations.run(lambda: self._commit(batch))
+            return True
+        except Exception:
+            logger.exception("Group commit of %d journalled sale(s) failed, retrying one at a time", len(batch))
+
+        for record in batch:
+            if not self._apply_one(record):
+                return False
+        return True
+
+    def _apply_one(self, record):
+        save = lambda: self.sales.reservations.run(lambda: self._commit([record]))
+        try:
+            save()
+            return True
+        except OperationalError:
+            # locked, disk full and the like, the sale itself is fine so it waits its turn
+            logger.exception("Journalled sale %s could not be saved, retrying", record.seq)
+            return self._keep_trying(save, f"Saving journalled sale {record.seq}")
+        except Exception as e:
+            error = e
+
+        # the database refuses this sale, it is set aside so it cannot hold up every later one
+        logger.error("Journalled sale %s was refused (%s), it was moved to %s",
+                     record.seq, error, self.journal.failed_path)
+        metrics.count('journal.set_aside')
+        return (self._keep_trying(lambda: self.journal.set_aside(record, error), f"Setting aside sale {record.seq}")
+                and self._keep_trying(lambda: self.sales.reservations.run(lambda: self._commit([], record.seq)),
+                                      f"Checkpointing past sale {record.seq}"))
+
+    def _keep_trying(self, fn, what):
+        # runs fn until it succeeds, False if the writer is closed first
+        while not self._closing.wait(RETRY_DELAY):
+            try:
+                fn()
+                return True
+            except Exception:
+                logger.exception("%s failed, retrying in %gs", what, RETRY_DELAY)
+        return False
+
+    def _commit(self, batch, skip_to=None):
+        stock = {}
+        unsold = []
+        with metrics.span('journal.group_commit'), self.db.session_scope() as session:
+            for record in batch:
+                _, rows, lines = self.sales._checkout_in_session(session, record.user_id, dict(record.items),
+                                                                date.fromisoformat(record.date))
+                for row in rows:
+                    stock[row[0]] = row
+                if lines:
+                    unsold.append((record, lines))
+
+            last_seq = skip_to or batch[-1].seq
+            statement = sqlite_insert(JournalCheckpoint).values(journal=self.journal.journal_id, last_seq=last_seq)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=[JournalCheckpoint.journal],
+                # a checkpoint only ever moves forward
+                set_={'last_seq': func.max(JournalCheckpoint.last_seq, statement.excluded.last_seq)}
+            ))
+
+        self.applied_seq = last_seq
+        self.applied += len(batch)
+        self.batches += 1
+        for row in stock.values():
+            self.stock_changes.put(row)
+        for record, lines in unsold:
+            self._set_aside_lines(record, lines)
+
+    def _set_aside_lines(self, record, lines):
+        # the sale is committed, so this must not raise or the batch would be applied twice
+        error = "; ".join(f"item {item_id}: {reason}" for item_id, (_, reason) in sorted(lines.items()))
+        metrics.count('journal.lines_set_aside', len(lines))
+        logger.error("Journalled sale %s was saved without %d line(s) (%s), they were moved to %s",
+                     record.seq, len(lines), error, self.journal.failed_path)
+        unsold = record._replace(items=sorted((item_id, quantity) for item_id, (quantity, _) in lines.items()))
+        try:
+            self.journal.set_aside(unsold, error)
+        except Exception:
+            logger.exception("Could not set aside the unsold lines of journalled sale %s: %s", record.seq, unsold)
+
+    def flush(self):
+        # blocks until every submitted sale is in the database
+        self._queue.join()
+
+    def close(self):
+        if self._thread:
+            # stops retrying, everything queued before this is still written if the database allows
+            self._closing.set()
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        # nothing left to replay, start the next run with an empty file
+        if self.applied_seq >= self.journal.last_seq:
+            self.journal.truncate()
+        else:
+            logger.warning("%d journalled sale(s) are not saved yet, they are replayed on the next start",
+                           self.journal.last_seq - self.applied_seq)
+        self.journal.close()
@@ -1,60 +1,156 @@
+import logging
 from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
 from database.models import Sale, SaleItem, Inventory
+from business.stock_reservation import StockReservationEngine, is_busy_error
+from business.rollups import SalesRollup
+from business.events import ChangeNotifier
+from business.sale_journal import SaleJournal, WriteBehindWriter
+from business.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# checkout statements, compiled once and then served from the statement cache
+INSERT_SALE = insert(Sale.__table__).returning(Sale.__table__.c.sale_id)
+INSERT_SALE_ITEM = insert(SaleItem.__table__)
 
 
 class SalesManager:
 
-    def __init__(self, db_handler):
+    def __init__(self, db_handler, reservation_engine=None, inventory_events=None, inventory_cache=None,
+                 journal_path=None):
         self.db = db_handler
-        print("Sales Manager is ready")
+        # names and costs come from the shared inventory cache when there is one
+        self.inventory_cache = inventory_cache
+        self.reservations = reservation_engine or StockReservationEngine()
+        # stock changes are announced on the inventory manager's notifier when shared
+        self.inventory_events = inventory_events or ChangeNotifier()
+        self.rollup = SalesRollup(db_handler)
+
+        # write-behind mode: sales are journalled to journal_path and written in the background
+        self.write_behind = None
+        if journal_path:
+            self.write_behind = WriteBehindWriter(self, SaleJournal(journal_path))
+            self.write_behind.start()
+        logger.info("Sales Manager is ready")
 
     def create_sale(self, user_id, items):
         if not items:
-            print("No items provided for the sale.")
+            logger.info("No items provided for the sale")
             return None
 
-        total_amount = 0
-        sale = Sale(
-            user_id=user_id,
-            date=datetime.now().date(),
-            total_amount=0
-        )
+        # merge duplicate lines so every item is read and decremented once
+        quantities = {}
+        for item_id, quantity in items:
+            quantities[item_id] = quantities.get(item_id, 0) + quantity
+
+        if self.write_behind:
+            # stock shortages are only found when the writer applies the sale
+            with metrics.span('checkout.journal'):
+                queued = self.write_behind.submit(user_id, quantities)
+            logger.debug("Sale %s recorded, it will be saved in the background", queued.seq)
+            return queued
 
         try:
-            self.db.session.add(sale)
-            self.db.session.flush()
-        except Exception as e:
-            print(f"Error while creating the sale: {e}")
-            self.db.session.rollback()
+            with metrics.span('checkout'):
+                sale, stock, _ = self.reservations.run(lambda: self._checkout(user_id, quantities))
+        except OperationalError as e:
+            if is_busy_error(e):
+                metrics.count('checkout.busy')
+                logger.warning("Database is busy, the sale could not be completed: %s", e)
+            else:
+                logger.exception("Error while completing the sale")
+            return None
+        except Exception:
+            logger.exception("Error while completing the sale")
             return None
 
-        for item_id, quantity in items:
-            item = self.db.session.query(Inventory).filter_by(item_id=item_id).first()
-
-            if item:
-                if item.quantity >= quantity:
-                    total_amount += item.cost * quantity
-                    sale_item = SaleItem(
-                        sale_id=sale.sale_id,
-                        item_id=item_id,
-                        quantity=quantity
-                    )
-                    item.quantity -= quantity
-
-                    self.db.session.add(sale_item)
-                    print(f"Added {quantity} of {item.item_name} to the sale.")
-                else:
-                    print(f"Not enough stock for {item.item_name}. Only {item.quantity} available.")
-            else:
-                print(f"Item with ID {item_id} not found in inventory.")
+        for row in stock:
+            self.inventory_events.publish('updated', row)
 
-        sale.total_amount = total_amount
+        logger.debug("Sale %s completed, total amount GBP%.2f", sale.sale_id, sale.total_amount)
+        return sale
 
-        try:
-            self.db.session.commit()
-            print(f"Sale completed successfully! Total amount: GBP{total_amount:.2f}")
-            return sale
-        except Exception as e:
-            print(f"Error while completing the sale: {e}")
-            self.db.session.rollback()
-            return None
+    def _checkout(self, user_id, quantities):
+        # each attempt runs in its own short-lived session, a busy retry starts clean
+        with self.db.session_scope() as session:
+            return self._checkout_in_session(session, user_id, quantities)
+
+    def _checkout_in_session(self, session, user_id, quantities, sale_date=None):
+        # returns (sale, stock, unsold), unsold maps the lines left out of the sale to why.
+        # Name and cost of every item in the cart come from the cache and a single IN (...)
+        # query for whatever it does not hold
+        if self.inventory_cache:
+            catalog, missing = self.inventory_cache.get_many(quantities)
+        else:
+            catalog, missing = {}, list(quantities)
+
+        if missing:
+            for row in session.execute(
+                select(Inventory.item_id, Inventory.item_name, Inventory.quantity, Inventory.cost)
+                .where(Inventory.item_id.in_(missing))
+            ):
+                catalog[row.item_id] = self.inventory_cache.put(row) if self.inventory_cache else row
+
+        unsold = {}
+        for item_id, quantity in quantities.items():
+            if item_id not in catalog:
+                logger.warning("Item with ID %s not found in inventory", item_id)
+                unsold[item_id] = (quantity, "not in inventory")
+        wanted = {item_id: quantity for item_id, quantity in quantities.items() if item_id in catalog}
+
+        # stock is decremented atomically in the database, not read-modify-written here
+        accepted, rejected, remaining = self.reservations.reserve(session, wanted)
+
+        for item_id, quantity in rejected.items():
+            logger.info("Not enough stock for %s, %s requested", catalog[item_id].item_name, quantity)
+            unsold[item_id] = (quantity, "not enough stock")
+        metrics.count('checkout.sales')
+        if rejected:
+            metrics.count('checkout.lines_rejected', len(rejected))
+
+        total_amount = 0
+        item_sales = []
+        for item_id, quantity in accepted.items():
+            revenue = catalog[item_id].cost * quantity
+            total_amount += revenue
+            item_sales.append((item_id, quantity, revenue))
+
+        # the sale row goes in complete with one INSERT ... RETURNING, the Sale handed back
+        # to the caller is a plain detached object
+        sale = Sale(user_id=user_id, date=sale_date or datetime.now().date(), total_amount=total_amount)
+        sale.sale_id = session.connection().execute(INSERT_SALE, {
+            'user_id': sale.user_id, 'date': sale.date, 'total_amount': total_amount
+        }).scalar_one()
+
+        # all sale lines go in with one executemany insert, as Core since no objects are needed back
+        if item_sales:
+            session.connection().execute(INSERT_SALE_ITEM, [
+                {'sale_id': sale.sale_id, 'item_id': item_id, 'quantity': quantity}
+                for item_id, quantity, _ in item_sales
+            ])
+
+        # keep the rollups in step within the same transaction
+        self.rollup.record_sale(session, sale.date, user_id, total_amount, sum(accepted.values()))
+        self.rollup.record_item_sales(session, sale.date, item_sales)
+
+        # new (item_id, item_name, quantity, cost) of every item the sale touched
+        stock = [(item_id, catalog[item_id].item_name, remaining[item_id], catalog[item_id].cost)
+                 for item_id in accepted]
+        return sale, stock, unsold
+
+    def publish_applied(self):
+        # announces stock changes made by the write-behind writer, call it from the Tk thread
+        if not self.write_behind:
+            return
+        changes = self.write_behind.stock_changes
+        while not changes.empty():
+            self.inventory_events.publish('updated', changes.get_nowait())
+
+    def close(self):
+        # waits for the write-behind writer to save every journalled sale
+        if self.write_behind:
+            self.write_behind.close()
+            self.publish_applied()
+            self.write_behind = None
@@ -0,0 +1,89 @@
+import random
+import sqlite3
+import time
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import OperationalError
+from database.models import Inventory
+
+# SQLite result codes for a locked database
+SQLITE_BUSY_CODES = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+# built once against the table, so it is compiled once and then served from the statement cache
+_inventory = Inventory.__table__
+RESERVE_STOCK = (
+    update(_inventory)
+    .where(_inventory.c.item_id == bindparam('reserve_id'), _inventory.c.quantity >= bindparam('reserve_qty'))
+    .values(quantity=_inventory.c.quantity - bindparam('reserve_qty'))
+    .returning(_inventory.c.quantity)
+)
+
+
+def is_busy_error(error):
+    # true when the error means another connection is holding the write lock
+    orig = getattr(error, 'orig', error)
+    code = getattr(orig, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in SQLITE_BUSY_CODES
+    message = str(orig).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class StockReservationEngine:
+
+    def __init__(self, max_retries=8, base_delay=0.01, max_delay=0.5):
+        # retry settings used when the database is busy
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # counters so callers can see how often tills collided
+        self.busy_retries = 0
+        self.busy_wait = 0.0
+
+    def reserve(self, session, quantities):
+        """
+        Decrements stock for every (item_id -> quantity) pair with a conditional UPDATE.
+        A line is accepted only if the row was actually updated, so two tills can never
+        both take the last unit. Returns (accepted, rejected, remaining) dicts of
+        item_id -> quantity, remaining holding the new stock level of accepted items.
+        """
+        accepted = {}
+        rejected = {}
+        remaining = {}
+
+        # the session's own connection, skipping the ORM layer the plain UPDATE does not need
+        connection = session.connection()
+        for item_id, quantity in quantities.items():
+            # RETURNING hands back a row only when the update matched
+            left = connection.execute(RESERVE_STOCK, {'reserve_id': item_id, 'reserve_qty': quantity}).scalar()
+            if left is not None:
+                accepted[item_id] = quantity
+                remaining[item_id] = left
+            else:
+                rejected[item_id] = quantity
+
+        return accepted, rejected, remaining
+
+    def run(self, operation, on_retry=None):
+        """
+        Runs operation() and retries it with bounded exponential backoff while SQLite
+        reports SQLITE_BUSY. on_retry is called before each retry so the caller can
+        roll back its transaction.
+        """
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except OperationalError as e:
+                if not is_busy_error(e) or attempt >= self.max_retries:
+                    raise
+                if on_retry:
+                    on_retry()
+
+                # full jitter keeps competing tills from retrying in lockstep
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                self.busy_retries += 1
+                self.busy_wait += delay
+                time.sleep(delay)
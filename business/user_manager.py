@@ -1,26 +1,38 @@
+import logging
+
+from sqlalchemy import select, update
 from database.models import User
-import hashlib
-import os
+from business.events import ChangeNotifier
+from business.password_hasher import PasswordHasher
+from business.auth_tokens import Principal, TokenStore
+from business.instrumentation import metrics, timed
+from business.paging import keyset_page, prefix_filter
+
+logger = logging.getLogger(__name__)
+
+# columns iter_users can sort by, both are indexed
+USER_ORDERINGS = ('user_id', 'username')
+
 
 class UserManager:
 
-    def __init__(self, db_handler):
+    def __init__(self, db_handler, hasher=None, persist_tokens=False):
         self.db = db_handler
-        print("User Manager is ready")
+        # KDF for new passwords, also verifies (and upgrades) hashes in older formats
+        self.hasher = hasher or PasswordHasher()
+        # session tokens, kept in the database too when several tills share it
+        self.tokens = TokenStore(db_handler if persist_tokens else None)
+        # 'added' / 'updated' carry a (user_id, username, email) row, 'deleted' the user_id
+        self.events = ChangeNotifier()
+        logger.info("User Manager is ready")
 
     def _hash_password(self, password):
-        salt = os.urandom(16).hex()
-        hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-        return f"{salt}${hashed}"
-
-    def _verify_password(self, password, stored_hash):
-        salt, hash_value = stored_hash.split('$')
-        computed_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-        return computed_hash == hash_value
+        return self.hasher.hash(password)
 
+    @timed('user.create')
     def create_user(self, username, password, email):
         if not username or not password or not email:
-            print("Error: All fields (username, password, email) must be provided.")
+            logger.warning("All fields (username, password, email) must be provided")
             return None
 
         hashed = self._hash_password(password)
@@ -30,77 +42,149 @@ class UserManager:
             email=email
         )
         try:
-            self.db.session.add(new_user)
-            self.db.session.commit()
-            print(f"User '{username}' created successfully!")
+            with self.db.session_scope() as session:
+                session.add(new_user)
+            logger.info("User '%s' created", username)
+            self.events.publish('added', (new_user.user_id, new_user.username, new_user.email))
             return new_user
-        except Exception as e:
-            print(f"Error creating user: {e}")
-            self.db.session.rollback()
+        except Exception:
+            logger.exception("Error creating user '%s'", username)
             return None
 
+    @timed('user.verify')
     def verify_user(self, username, password):
-        user = self.db.session.query(User).filter_by(username=username).first()
-        if user and self._verify_password(password, user.password):
-            print(f"User '{username}' verified successfully!")
-            return user
-        print(f"Verification failed for user '{username}'.")
+        with self.db.session_scope() as session:
+            user = session.query(User).filter_by(username=username).first()
+        if user:
+            matches, rehash = self.hasher.verify(password, user.password)
+            if matches:
+                if rehash:
+                    self._rehash_password(user, password)
+                logger.debug("User '%s' verified", username)
+                return user
+        metrics.count('user.verify_failed')
+        logger.info("Verification failed for user '%s'", username)
         return None
 
+    @timed('login')
+    def login(self, username, password):
+        # verifies the password once and returns (principal, token), or None
+        user = self.verify_user(username, password)
+        if not user:
+            return None
+        principal = Principal.from_user(user)
+        return principal, self.tokens.issue(principal, password)
+
+    @timed('login.resume')
+    def resume(self, token, password):
+        # the principal of a live session token once its owner has given the password again.
+        # None when the session has ended, False for a wrong password. The password is
+        # checked against the verifier kept with the token, without the users table or the KDF
+        principal = self.tokens.resolve(token)
+        if principal is None:
+            return None
+        matches = self.tokens.check_password(token, password)
+        if matches is None:
+            # issued on another till, which kept the verifier to itself
+            user = self.verify_user(principal.username, password)
+            matches = user is not None and user.user_id == principal.user_id
+        if not matches:
+            metrics.count('user.resume_failed')
+            logger.info("Resume failed for user '%s'", principal.username)
+            return False
+        return principal
+
+    def logout(self, token):
+        self.tokens.revoke(token)
+
+    def _rehash_password(self, user, password):
+        # moves a stored hash to the current KDF and parameters, only if nobody changed it meanwhile
+        old_hash = user.password
+        new_hash = self._hash_password(password)
+        with self.db.session_scope() as session:
+            updated = session.execute(
+                update(User)
+                .where(User.user_id == user.user_id, User.password == old_hash)
+                .values(password=new_hash)
+            ).rowcount
+        if updated:
+            user.password = new_hash
+            logger.info("Password hash for user '%s' upgraded to %s", user.username, self.hasher.hasher.algorithm)
+
     def get_user(self, user_id):
-        user = self.db.session.query(User).filter_by(user_id=user_id).first()
-        if user:
-            print(f"User found: {user.username}")
-        else:
-            print(f"No user found with ID {user_id}.")
+        with self.db.session_scope() as session:
+            user = session.get(User, user_id)
+        if user is None:
+            logger.debug("No user found with ID %s", user_id)
         return user
 
     def get_all_users(self):
-        users = self.db.session.query(User).all()
-        print(f"Retrieved {len(users)} user(s) from the database.")
+        with self.db.session_scope() as session:
+            users = session.query(User).all()
+        logger.debug("Retrieved %d user(s) from the database", len(users))
         return users
 
+    def iter_users(self, after=None, limit=50, username_prefix=None, order_by='user_id'):
+        """
+        Returns one page of (user_id, username, email) tuples that come after the cursor
+        in order_by order ('user_id' or 'username'). The cursor for the next page is
+        page_cursor(last_row, USER_ORDERINGS.index(order_by)).
+        """
+        if order_by not in USER_ORDERINGS:
+            raise ValueError(f"Users can only be ordered by {', '.join(USER_ORDERINGS)}.")
+        column = getattr(User, order_by)
+
+        statement = select(User.user_id, User.username, User.email)
+        if username_prefix:
+            statement = prefix_filter(statement, User.username, username_prefix)
+        statement = keyset_page(statement, column, User.user_id, after, limit)
+
+        with self.db.session_scope() as session:
+            return [tuple(row) for row in session.execute(statement)]
+
     def update_user_password(self, user_id, new_password):
-        user = self.get_user(user_id)
-        if user:
-            user.password = self._hash_password(new_password)
-            try:
-                self.db.session.commit()
-                print(f"Password for user '{user.username}' updated successfully!")
-                return True
-            except Exception as e:
-                print(f"Error updating password: {e}")
-                self.db.session.rollback()
-                return False
-        print(f"User with ID {user_id} not found.")
-        return False
+        try:
+            with self.db.session_scope() as session:
+                user = session.get(User, user_id)
+                if not user:
+                    logger.info("User with ID %s not found", user_id)
+                    return False
+                user.password = self._hash_password(new_password)
+            # sessions opened with the old password end with it
+            self.tokens.revoke_user(user_id)
+            logger.info("Password for user '%s' updated", user.username)
+            return True
+        except Exception:
+            logger.exception("Error updating the password of user %s", user_id)
+            return False
 
     def update_user_email(self, user_id, new_email):
-        user = self.get_user(user_id)
-        if user:
-            user.email = new_email
-            try:
-                self.db.session.commit()
-                print(f"Email for user '{user.username}' updated to {new_email}.")
-                return True
-            except Exception as e:
-                print(f"Error updating email: {e}")
-                self.db.session.rollback()
-                return False
-        print(f"User with ID {user_id} not found.")
-        return False
+        try:
+            with self.db.session_scope() as session:
+                user = session.get(User, user_id)
+                if not user:
+                    logger.info("User with ID %s not found", user_id)
+                    return False
+                user.email = new_email
+            logger.info("Email for user '%s' updated", user.username)
+            self.events.publish('updated', (user.user_id, user.username, user.email))
+            return True
+        except Exception:
+            logger.exception("Error updating the email of user %s", user_id)
+            return False
 
     def delete_user(self, user_id):
-        user = self.get_user(user_id)
-        if user:
-            try:
-                self.db.session.delete(user)
-                self.db.session.commit()
-                print(f"User '{user.username}' deleted successfully!")
-                return True
-            except Exception as e:
-                print(f"Error deleting user: {e}")
-                self.db.session.rollback()
-                return False
-        print(f"User with ID {user_id} not found.")
-        return False
+        try:
+            with self.db.session_scope() as session:
+                user = session.get(User, user_id)
+                if not user:
+                    logger.info("User with ID %s not found", user_id)
+                    return False
+                session.delete(user)
+            self.tokens.revoke_user(user_id)
+            logger.info("User '%s' deleted", user.username)
+            self.events.publish('deleted', user_id)
+            return True
+        except Exception:
+            logger.exception("Error deleting user %s", user_id)
+            return False
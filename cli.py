@@ -0,0 +1,92 @@
+import argparse
+from datetime import date
+
+from database.db_handler import DatabaseHandler
+from business.rollups import SalesRollup
+from business.exporters import DATASETS, EXPORT_BATCH_SIZE, WRITERS, DataExporter
+from business.bulk_import import IMPORT_BATCH_SIZE, IMPORT_MODES, READERS, BulkImporter
+from business.instrumentation import configure_logging, metrics
+from database.query_profiler import QueryProfiler, SLOW_QUERY_THRESHOLD
+
+
+def rebuild_rollups(db, args):
+    SalesRollup(db).rebuild()
+
+
+def export_data(db, args):
+    extension = {'csv': 'csv', 'jsonl': 'jsonl', 'columnar': 'bbcol'}[args.format]
+    path = args.output or f"{args.dataset}.{extension}" + ('.gz' if args.gzip else '')
+
+    exporter = DataExporter(db, batch_size=args.batch_size)
+    rows, seconds = exporter.export(args.dataset, path, args.format, compress=args.gzip,
+                                    start=args.start, end=args.end)
+    rate = rows / seconds if seconds else 0
+    print(f"Exported {rows} row(s) to {path} in {seconds:.2f}s ({rate:,.0f} rows/s).")
+
+
+def import_items(db, args):
+    importer = BulkImporter(db, batch_size=args.batch_size)
+    report = importer.import_file(args.path, fmt=args.format, mode=args.mode, dry_run=args.dry_run)
+    print(report.summary())
+    if args.dry_run:
+        print("Dry run, nothing was written.")
+
+    if args.diff:
+        with open(args.diff, 'w', newline='', encoding='utf-8') as file:
+            report.write_diff(file)
+        print(f"Reconciliation written to {args.diff}.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Brew and Bite maintenance commands")
+    parser.add_argument('--db', default='sqlite:///cafe.db', help="database url (default: %(default)s)")
+    parser.add_argument('--log-level', default='INFO', help="DEBUG, INFO, WARNING or ERROR (default: %(default)s)")
+    parser.add_argument('--metrics', help="write operation timings to this file (.json or Prometheus text)")
+    parser.add_argument('--profile-sql', action='store_true', help="print a per-statement SQL profile on exit")
+    parser.add_argument('--slow-log', help="write statements slower than --slow-ms here, with their query plans")
+    parser.add_argument('--slow-ms', type=float, default=SLOW_QUERY_THRESHOLD * 1000,
+                        help="slow statement threshold in milliseconds (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rollups = commands.add_parser('rebuild-rollups', help="recompute the sales rollup tables from scratch")
+    rollups.set_defaults(handler=rebuild_rollups)
+
+    export = commands.add_parser('export', help="stream a table to CSV, JSON Lines or the columnar format")
+    export.add_argument('dataset', choices=sorted(DATASETS))
+    export.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    export.add_argument('--output', help="file to write (default: <dataset>.<format>)")
+    export.add_argument('--gzip', action='store_true', help="gzip the output")
+    export.add_argument('--from', dest='start', type=date.fromisoformat, help="first date, YYYY-MM-DD")
+    export.add_argument('--to', dest='end', type=date.fromisoformat, help="last date, YYYY-MM-DD")
+    export.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    export.set_defaults(handler=export_data)
+
+    bulk = commands.add_parser('import', help="bulk load a supplier catalog or a stock-take into the inventory")
+    bulk.add_argument('path', help="csv, json or jsonl file, optionally gzipped")
+    bulk.add_argument('--format', choices=sorted(READERS), help="file format (default: from the extension)")
+    bulk.add_argument('--mode', choices=IMPORT_MODES, default='catalog',
+                      help="catalog adds and updates items, stocktake only sets counted quantities")
+    bulk.add_argument('--diff', help="write the reconciliation to this CSV file")
+    bulk.add_argument('--dry-run', action='store_true', help="reconcile without writing anything")
+    bulk.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    bulk.set_defaults(handler=import_items)
+
+    return parser
+
+
+#entry point for headless maintenance tasks
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    configure_logging(args.log_level)
+    profiler = None
+    if args.profile_sql or args.slow_log:
+        profiler = QueryProfiler(slow_threshold=args.slow_ms / 1000, slow_log=args.slow_log)
+    db = DatabaseHandler(args.db, query_profiler=profiler)
+    try:
+        args.handler(db, args)
+    finally:
+        db.close()
+        if args.metrics:
+            metrics.dump(args.metrics)
+        if profiler:
+            profiler.print_summary()
@@ -1,42 +1,119 @@
-from sqlalchemy import create_engine
+import logging
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from database.models import Base
+from database.migrations import SCHEMA_VERSION, get_schema_version, upgrade
+from database.query_profiler import ProfilingConnection
+from business.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# default connection pool settings, tunable per DatabaseHandler
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+
+# pragmas applied to every new SQLite connection. WAL lets readers run alongside the
+# writer and synchronous=NORMAL only fsyncs at checkpoints instead of on every commit
+PERFORMANCE_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # milliseconds
+}
+
+# sqlite defaults, useful as a baseline when benchmarking
+DEFAULT_PROFILE = {}
 
 class DatabaseHandler:
 
-    def __init__(self):
+    def __init__(self, db_url='sqlite:///cafe.db', pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                 pool_timeout=POOL_TIMEOUT, profile=None, query_profiler=None):
         try:
-            # Creates engine
-            self.engine = create_engine('sqlite:///cafe.db')
-            # Creates all tables
-            Base.metadata.create_all(self.engine)
+            # Creates engine with a connection pool that any thread can borrow from
+            options = self._pool_options(db_url, pool_size, max_overflow, pool_timeout)
+            if query_profiler and db_url.startswith('sqlite'):
+                # cursors that count fetched rows for the profiler
+                options['connect_args']['factory'] = ProfilingConnection
+            self.engine = create_engine(db_url, **options)
+
+            # opt-in statement profiling, attached before the schema work so that is profiled too
+            self.query_profiler = query_profiler
+            if query_profiler:
+                query_profiler.attach(self.engine)
+
+            # performance pragmas, pass DEFAULT_PROFILE to keep sqlite's own settings
+            self.profile = dict(PERFORMANCE_PROFILE if profile is None else profile)
+            if self.engine.dialect.name == 'sqlite' and self.profile:
+                event.listen(self.engine, 'connect', self._apply_profile)
+
+            # Creates all tables and upgrades older database files. A file already at
+            # SCHEMA_VERSION has every table, so the table by table check of create_all is skipped
+            with self.engine.connect() as connection:
+                version = get_schema_version(connection)
+            if version != SCHEMA_VERSION:
+                Base.metadata.create_all(self.engine)
+                for step in upgrade(self.engine):
+                    logger.info("Applied database migration: %s", step)
+
+            # session factory bound to the engine, one short-lived session per operation.
+            # objects stay readable after commit so they can be handed to the windows
+            self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+            logger.info("Database connection established")
+        except Exception:
+            # a handler without an engine or sessions is no use to anybody, let the caller report it
+            logger.exception("Error connecting to the database")
+            raise
 
-            # session binder with engine
-            Session = sessionmaker(bind=self.engine)
-            self.session = Session()
+    @staticmethod
+    def _pool_options(db_url, pool_size, max_overflow, pool_timeout):
+        if not db_url.startswith('sqlite'):
+            return {'poolclass': QueuePool, 'pool_size': pool_size, 'max_overflow': max_overflow,
+                    'pool_timeout': pool_timeout, 'pool_pre_ping': True}
 
-            print("Database connection established successfully!")
-        except Exception as e:
-            print(f"Error connecting to the database: {e}")
+        # sqlite connections are handed between the Tk thread and worker threads
+        connect_args = {'check_same_thread': False}
+        if db_url in ('sqlite://', 'sqlite:///:memory:'):
+            # an in-memory database only exists on its one connection
+            return {'poolclass': StaticPool, 'connect_args': connect_args}
+        return {'poolclass': QueuePool, 'pool_size': pool_size, 'max_overflow': max_overflow,
+                'pool_timeout': pool_timeout, 'connect_args': connect_args}
 
-    def commit(self):
+    def _apply_profile(self, dbapi_connection, connection_record):
+        # runs once for every new pooled connection
+        cursor = dbapi_connection.cursor()
         try:
-            self.session.commit()
-            print("Changes committed to the database successfully!")
-        except Exception as e:
-            print(f"Error committing to the database: {e}")
-            self.rollback()
+            for pragma, value in self.profile.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
 
-    def rollback(self):
+    @contextmanager
+    def session_scope(self):
+        """
+        Provides a transactional scope around a series of operations. The session is
+        committed on success, rolled back on error and always closed afterwards.
+        """
+        session = self.Session()
         try:
-            self.session.rollback()
-            print("Transaction rolled back due to an error.")
-        except Exception as e:
-            print(f"Error rolling back the transaction: {e}")
+            with metrics.span('db.transaction'):
+                yield session
+                session.commit()
+        except Exception:
+            session.rollback()
+            metrics.count('db.rollbacks')
+            raise
+        finally:
+            session.close()
 
     def close(self):
         try:
-            self.session.close()
-            print("Database session closed.")
-        except Exception as e:
-            print(f"Error closing the database session: {e}")
+            self.engine.dispose()
+            logger.info("Database connections closed")
+        except Exception:
+            logger.exception("Error closing the database connections")
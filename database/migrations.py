@@ -0,0 +1,65 @@
+from sqlalchemy import text
+from database.models import AuthToken, Base, DailySalesSummary, ItemSalesDaily, JournalCheckpoint
+
+
+def _create_indexes(connection):
+    # existing cafe.db files were created before the models declared any indexes,
+    # create_all only adds indexes together with a brand new table
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _create_daily_sales_summary(connection):
+    # the rollup table is filled from the sales history that is already there
+    from business.rollups import rebuild_daily_sales
+
+    DailySalesSummary.__table__.create(connection, checkfirst=True)
+    rebuild_daily_sales(connection)
+
+
+def _create_item_sales_daily(connection):
+    from business.rollups import rebuild_item_sales
+
+    ItemSalesDaily.__table__.create(connection, checkfirst=True)
+    rebuild_item_sales(connection)
+
+
+def _create_auth_tokens(connection):
+    AuthToken.__table__.create(connection, checkfirst=True)
+
+
+def _create_journal_checkpoints(connection):
+    JournalCheckpoint.__table__.create(connection, checkfirst=True)
+
+
+# ordered schema upgrades, a database at version N has had the first N steps applied
+MIGRATIONS = [
+    _create_indexes,
+    _create_daily_sales_summary,
+    _create_item_sales_daily,
+    _create_auth_tokens,
+    _create_journal_checkpoints,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection):
+    # stored in the sqlite file header, 0 for databases that predate migrations
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(engine):
+    """
+    Brings the database up to SCHEMA_VERSION by running every pending migration step.
+    Returns the list of step names that were applied.
+    """
+    applied = []
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            step(connection)
+            connection.execute(text(f"PRAGMA user_version = {number}"))
+            applied.append(step.__name__.lstrip('_'))
+    return applied
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -55,6 +55,11 @@ class Expense(Base):
     # relationship to the user model
     user = relationship("User", back_populates="expenses")
 
+    # expense reports filter by date and group by category
+    __table_args__ = (
+        Index('ix_expenses_date_category', 'date', 'category'),
+    )
+
 
 class Inventory(Base):
 
@@ -66,8 +71,8 @@ class Inventory(Base):
     # name of the inventory item
     item_name = Column(String(100), unique=True, nullable=False)
 
-    # quantity of the item available in the inventory
-    quantity = Column(Integer, nullable=False)
+    # quantity of the item available in the inventory (indexed for the low stock report)
+    quantity = Column(Integer, nullable=False, index=True)
 
     # cost of the item
     cost = Column(Float, nullable=False)
@@ -86,8 +91,8 @@ class Sale(Base):
     # establishes (Foreign Key)
     user_id = Column(Integer, ForeignKey('users.user_id'))
 
-    # date the sale
-    date = Column(Date, nullable=False)
+    # date the sale (indexed for the daily and monthly reports)
+    date = Column(Date, nullable=False, index=True)
 
     # Total amount of the sale
     total_amount = Column(Float, nullable=False)
@@ -98,6 +103,11 @@ class Sale(Base):
     # Relationship to the SaleItem model (a sale can have multiple items)
     sale_items = relationship("SaleItem", back_populates="sale")
 
+    # per-user sales history in date order
+    __table_args__ = (
+        Index('ix_sales_user_id_date', 'user_id', 'date'),
+    )
+
 class SaleItem(Base):
 
     __tablename__ = 'sales_items'
@@ -106,10 +116,10 @@ class SaleItem(Base):
     sale_item_id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Link to the sale this item belongs to (Foreign Key)
-    sale_id = Column(Integer, ForeignKey('sales.sale_id'))
+    sale_id = Column(Integer, ForeignKey('sales.sale_id'), index=True)
 
     # Link to the inventory item being sold (Foreign Key)
-    item_id = Column(Integer, ForeignKey('inventory.item_id'))
+    item_id = Column(Integer, ForeignKey('inventory.item_id'), index=True)
 
     # Quantity of the item sold
     quantity = Column(Integer, nullable=False)
@@ -142,3 +152,65 @@ class FinancialReport(Base):
 
     # Relationship to the User model (each report belongs to one user)
     user = relationship("User", back_populates="reports")
+
+
+class DailySalesSummary(Base):
+
+    __tablename__ = 'daily_sales_summary'
+
+    # day the sales were made (Primary Key together with user_id)
+    date = Column(Date, primary_key=True)
+
+    # user who made the sales, 0 for sales without a user
+    user_id = Column(Integer, primary_key=True)
+
+    # sum of total_amount over the day's sales
+    revenue = Column(Float, nullable=False, default=0)
+
+    # number of sales made
+    sale_count = Column(Integer, nullable=False, default=0)
+
+    # number of units sold over all sale lines
+    units_sold = Column(Integer, nullable=False, default=0)
+
+
+class ItemSalesDaily(Base):
+
+    __tablename__ = 'item_sales_daily'
+
+    # day the items were sold (Primary Key together with item_id)
+    date = Column(Date, primary_key=True)
+
+    # inventory item that was sold
+    item_id = Column(Integer, primary_key=True)
+
+    # units of the item sold on the day
+    units_sold = Column(Integer, nullable=False, default=0)
+
+    # revenue from the item on the day
+    revenue = Column(Float, nullable=False, default=0)
+
+
+class AuthToken(Base):
+
+    __tablename__ = 'auth_tokens'
+
+    # sha256 of the token, the token itself is only ever held by the till (Primary Key)
+    token_hash = Column(String(64), primary_key=True)
+
+    # user the token was issued to, indexed so logging out everywhere is one delete
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False, index=True)
+
+    # unix time after which the token is no longer accepted
+    expires_at = Column(Float, nullable=False)
+
+
+class JournalCheckpoint(Base):
+
+    __tablename__ = 'journal_checkpoints'
+
+    # id from the write-behind journal's header (Primary Key)
+    journal = Column(String(100), primary_key=True)
+
+    # sequence number of the last journal record applied to the database
+    last_seq = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,223 @@
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+# statements slower than this (seconds) go to the slow query log
+SLOW_QUERY_THRESHOLD = 0.05
+
+# the same statement this many times in one transaction is reported as a likely N+1
+REPEAT_THRESHOLD = 3
+
+# rows in the summary table printed on exit
+SUMMARY_ROWS = 20
+
+_SPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+
+
+def normalize(statement):
+    # one key per statement shape: literals become ? and IN lists of any length (?...)
+    statement = _SPACE.sub(" ", statement).strip()
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _IN_LIST.sub("(?...)", statement)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    # times and counts the rows fetched. sqlite runs a SELECT step by step as it is read,
+    # so execute() only covers the first row and the rest of the work happens here
+
+    profiler = None
+
+    def _fetched(self, started, rows, count):
+        if self.profiler is not None:
+            self.profiler._fetched(self, time.perf_counter() - started, count)
+        return rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        return self._fetched(started, row, row is not None)
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        return self._fetched(started, rows, len(rows))
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        return self._fetched(started, rows, len(rows))
+
+
+class ProfilingConnection(sqlite3.Connection):
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+
+class StatementStats:
+
+    __slots__ = ('statement', 'calls', 'total', 'max', 'rows', 'repeats', 'max_repeats')
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        # transactions that ran the statement REPEAT_THRESHOLD or more times, and the worst count
+        self.repeats = 0
+        self.max_repeats = 0
+
+
+class QueryProfiler:
+    """
+    Opt-in profiler for everything an engine executes, hooked on the
+    before/after_cursor_execute events. Statements are grouped by their normalized
+    text with call counts, total and max latency and rows; statements repeated inside
+    one transaction are flagged as likely N+1 patterns, and slow statements are written
+    to slow_log together with their EXPLAIN QUERY PLAN.
+
+    Pass it to DatabaseHandler(query_profiler=...) so the rows a SELECT returns and the
+    time spent fetching them are counted too, otherwise only the first step is timed
+    and only rows changed by writes are known.
+    """
+
+    def __init__(self, slow_threshold=SLOW_QUERY_THRESHOLD, slow_log=None, repeat_threshold=REPEAT_THRESHOLD):
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        self.repeat_threshold = repeat_threshold
+        self.stats = {}
+        self.slow_queries = 0
+        self.engine = None
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        self.engine = engine
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'commit', self._end_transaction)
+        event.listen(engine, 'rollback', self._end_transaction)
+
+    def detach(self):
+        if self.engine is None:
+            return
+        event.remove(self.engine, 'before_cursor_execute', self._before)
+        event.remove(self.engine, 'after_cursor_execute', self._after)
+        event.remove(self.engine, 'commit', self._end_transaction)
+        event.remove(self.engine, 'rollback', self._end_transaction)
+        self.engine = None
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['profiler_started'].pop()
+        key = normalize(statement)
+
+        with self._lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = StatementStats(key)
+            entry.calls += 1
+            entry.total += elapsed
+            entry.max = max(entry.max, elapsed)
+            if cursor.rowcount > 0:
+                entry.rows += cursor.rowcount
+
+        # an executemany is one batched call, only single statements can be an N+1
+        if not executemany:
+            seen = conn.info.setdefault('profiler_transaction', {})
+            seen[key] = seen.get(key, 0) + 1
+
+        slow = elapsed >= self.slow_threshold
+        if isinstance(cursor, ProfilingCursor):
+            # the fetches add to this execution's time, see _fetched
+            cursor.profiler = self
+            cursor.profile = (entry, conn, statement, parameters, executemany)
+            cursor.elapsed = elapsed
+            cursor.logged = slow
+        if slow:
+            self._log_slow(conn, cursor, statement, parameters, executemany, elapsed)
+
+    def _fetched(self, cursor, seconds, rows):
+        # fetch time and rows of a ProfilingCursor, counted towards the statement that ran on it.
+        # A streamed query is logged as slow once it crosses the threshold, with the time so far
+        entry, conn, statement, parameters, executemany = cursor.profile
+        with self._lock:
+            cursor.elapsed += seconds
+            entry.total += seconds
+            entry.max = max(entry.max, cursor.elapsed)
+            entry.rows += rows
+        if not cursor.logged and cursor.elapsed >= self.slow_threshold:
+            cursor.logged = True
+            self._log_slow(conn, cursor, statement, parameters, executemany, cursor.elapsed)
+
+    def _end_transaction(self, conn):
+        seen = conn.info.pop('profiler_transaction', None)
+        if not seen:
+            return
+        with self._lock:
+            for key, times in seen.items():
+                if times >= self.repeat_threshold:
+                    entry = self.stats[key]
+                    entry.repeats += 1
+                    entry.max_repeats = max(entry.max_repeats, times)
+
+    def _query_plan(self, conn, cursor, statement, parameters, executemany):
+        # asked on the raw DBAPI connection, so it does not show up in the profile itself
+        if conn.dialect.name != 'sqlite' or not statement.lstrip().upper().startswith(
+                ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')):
+            return []
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        try:
+            rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in rows]
+        except sqlite3.Error as e:
+            return [f"(no plan: {e})"]
+
+    def _log_slow(self, conn, cursor, statement, parameters, executemany, elapsed):
+        with self._lock:
+            self.slow_queries += 1
+        if not self.slow_log:
+            return
+
+        lines = [f"-- {datetime.now().isoformat(timespec='seconds')} {elapsed * 1000:.1f} ms",
+                 _SPACE.sub(" ", statement).strip(),
+                 f"-- parameters: {str(parameters)[:200]}"]
+        lines += [f"-- plan: {step}" for step in self._query_plan(conn, cursor, statement, parameters, executemany)]
+        with self._lock, open(self.slow_log, 'a', encoding='utf-8') as file:
+            file.write("\n".join(lines) + "\n\n")
+
+    def summary(self, limit=SUMMARY_ROWS):
+        # text table of the statements with the most total time, then the likely N+1s
+        with self._lock:
+            entries = sorted(self.stats.values(), key=lambda e: e.total, reverse=True)
+            repeated = sorted((e for e in entries if e.repeats), key=lambda e: e.repeats, reverse=True)
+
+        lines = [f"{'calls':>8} {'total ms':>10} {'avg ms':>8} {'max ms':>8} {'rows':>9}  statement"]
+        for entry in entries[:limit]:
+            lines.append(f"{entry.calls:>8} {entry.total * 1000:>10.1f} {entry.total / entry.calls * 1000:>8.2f} "
+                         f"{entry.max * 1000:>8.2f} {entry.rows:>9}  {entry.statement[:100]}")
+        total = sum(entry.total for entry in entries)
+        lines.append(f"{sum(entry.calls for entry in entries)} statement(s), {total * 1000:.1f} ms in total, "
+                     f"{self.slow_queries} over {self.slow_threshold * 1000:.0f} ms")
+
+        if repeated:
+            lines.append("")
+            lines.append(f"Run {self.repeat_threshold}+ times in one transaction (possible N+1):")
+            for entry in repeated[:limit]:
+                lines.append(f"  {entry.repeats} transaction(s), up to {entry.max_repeats}x: {entry.statement[:100]}")
+        return "\n".join(lines)
+
+    def print_summary(self, file=None):
+        print(self.summary(), file=file or sys.stderr)
@@ -1,7 +1,26 @@
+import os
+
+from business.instrumentation import configure_logging, metrics
 from presentation.main_window import MainWindow
 #entry point
 if __name__ == "__main__":
+    # BREWBITE_LOG_LEVEL=DEBUG logs every operation, BREWBITE_METRICS=<file> writes the
+    # operation timings there on exit (.json for JSON, anything else Prometheus text)
+    configure_logging(os.environ.get('BREWBITE_LOG_LEVEL', 'WARNING'))
+
+    # BREWBITE_PROFILE_SQL=1 prints a per-statement profile on exit, BREWBITE_SLOW_LOG=<file>
+    # also turns it on and writes slow statements there with their query plans
+    profiler = None
+    if os.environ.get('BREWBITE_PROFILE_SQL') or os.environ.get('BREWBITE_SLOW_LOG'):
+        from database.query_profiler import QueryProfiler
+        profiler = QueryProfiler(slow_log=os.environ.get('BREWBITE_SLOW_LOG'))
+
     # starts the app
-    app = MainWindow()
+    app = MainWindow(query_profiler=profiler)
     # launches app
     app.run()
+
+    if os.environ.get('BREWBITE_METRICS'):
+        metrics.dump(os.environ['BREWBITE_METRICS'])
+    if profiler:
+        profiler.print_summary()
@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from presentation.virtual_tree import VirtualTreeview
 
 class InventoryWindow:
 
@@ -23,24 +24,20 @@ class InventoryWindow:
         self.setup_item_form()
         self.load_inventory()
 
+        # rows are patched from the manager's change events instead of reloading the list
+        self.inventory_manager.events.subscribe(self.inventory_list.apply_change)
+        self.window.bind('<Destroy>', self.on_destroy)
+
     def setup_inventory_list(self):
         columns = ('ID', 'Name', 'Quantity', 'Cost')
 
-        # treeview widget integrated
-        self.tree = ttk.Treeview(self.list_frame, columns=columns, show='headings')
-
-        # defined column headers and their widths
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
+        # paged treeview, rows are fetched from the manager as the user scrolls
+        self.inventory_list = VirtualTreeview(self.list_frame, columns, self.inventory_manager.iter_items)
+        self.inventory_list.grid(row=0, column=0)
 
-        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.tree = self.inventory_list.tree
         self.tree.bind('<<TreeviewSelect>>', self.on_select)
 
-        scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        self.tree.configure(yscrollcommand=scrollbar.set)
-
     def setup_item_form(self):
 
         # item name field
@@ -65,13 +62,8 @@ class InventoryWindow:
 
     def load_inventory(self):
 
-        # Clear the existing items in the treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Add all items from the inventory to the treeview
-        for item in self.inventory_manager.get_all_items():
-            self.tree.insert('', 'end', values=(item.item_id, item.item_name, item.quantity, item.cost))
+        # Clear the treeview and load the first page of items
+        self.inventory_list.reload()
 
     def add_item(self):
 
@@ -82,7 +74,6 @@ class InventoryWindow:
 
             # Add the new item through the inventory manager
             self.inventory_manager.add_item(name, quantity, cost)
-            self.load_inventory()  # Reload the list of inventory items
             self.clear_form()  # Clear the input fields
             messagebox.showinfo("Success", "Item added successfully!")
         except Exception as e:
@@ -101,7 +92,6 @@ class InventoryWindow:
 
             # Update the selected item's quantity through the inventory manager
             self.inventory_manager.update_quantity(item_id, quantity)
-            self.load_inventory()
             messagebox.showinfo("Success", "Item updated successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update item: {e}")
@@ -116,12 +106,16 @@ class InventoryWindow:
             try:
                 item_id = self.tree.item(selected[0])['values'][0]
                 self.inventory_manager.delete_item(item_id)
-                self.load_inventory()
                 self.clear_form()
                 messagebox.showinfo("Success", "Item deleted successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete item: {e}")
 
+    def on_destroy(self, event):
+        # the binding fires for every child widget, only act for the window itself
+        if event.widget is self.window:
+            self.inventory_manager.events.unsubscribe(self.inventory_list.apply_change)
+
     def on_select(self, event):
 
         selected = self.tree.selection()
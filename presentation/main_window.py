@@ -1,34 +1,74 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database.db_handler import DatabaseHandler
-from business.user_manager import UserManager
-from business.inventory_manager import InventoryManager
-from business.sales_manager import SalesManager
-from presentation.inventory_window import InventoryWindow
-from presentation.sales_window import SalesWindow
-from presentation.reports_window import ReportsWindow
-from presentation.users_window import UsersWindow
+from business.job_runner import JobRunner
+
+# SQLAlchemy, the models, the managers and the other windows are imported where they are
+# first needed, so the login screen is on screen before any of them has loaded
+
+# how often the window checks on background logins, registrations and sales (milliseconds)
+POLL_INTERVAL = 50
 
 class MainWindow:
 
-    def __init__(self):
+    def __init__(self, sale_journal=None, query_profiler=None):
         # Initializer
         self.root = tk.Tk()
         self.root.title("Brew and Bite Café Management System")
         self.root.geometry("800x600")
 
-        # database setup
-        self.db = DatabaseHandler()
-        self.user_manager = UserManager(self.db)
-        self.inventory_manager = InventoryManager(self.db)
-        self.sales_manager = SalesManager(self.db)
+        # set up by open_database once the login screen is showing
+        self.db = None
+        self.user_manager = None
+        self.inventory_manager = None
+        self.sales_manager = None
+
+        # password hashing is slow on purpose, so it runs off the Tk thread
+        self.jobs = JobRunner(max_workers=1, name='auth')
 
-        # stores user
+        # the logged in Principal and its session token
         self.current_user = None
+        self.current_token = None
+
+        # username -> token of staff who switched away from this till without logging out
+        self.sessions = {}
 
         # login screen
         self.setup_login_frame()
 
+        # paint it now, then open the database in the background
+        self.root.update()
+        self.root.after_idle(self.run_in_background, 'startup', self.open_database, self.database_ready,
+                             sale_journal, query_profiler)
+
+    def open_database(self, sale_journal, query_profiler):
+        # runs on the job runner, the imports are the slow part of a cold start
+        from database.db_handler import DatabaseHandler
+        from business.user_manager import UserManager
+        from business.inventory_manager import InventoryManager
+        from business.sales_manager import SalesManager
+
+        db = DatabaseHandler(query_profiler=query_profiler)
+        user_manager = UserManager(db)
+        inventory_manager = InventoryManager(db)
+        # with a sale_journal path, sales are saved write-behind instead of on the Tk thread
+        sales_manager = SalesManager(db, inventory_events=inventory_manager.events,
+                                     inventory_cache=inventory_manager.cache, journal_path=sale_journal)
+        return db, user_manager, inventory_manager, sales_manager
+
+    def database_ready(self, managers, error):
+
+        if error:
+            messagebox.showerror("Error", f"Could not open the database: {error}")
+            return
+        self.db, self.user_manager, self.inventory_manager, self.sales_manager = managers
+        if self.sales_manager.write_behind:
+            self.root.after(POLL_INTERVAL, self.poll_sales)
+        self.set_login_state(tk.NORMAL)
+
+    def set_login_state(self, state):
+        self.login_button.config(state=state)
+        self.register_button.config(state=state)
+
     def setup_login_frame(self):
         self.login_frame = ttk.Frame(self.root, padding="20")
         self.login_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -41,29 +81,98 @@ class MainWindow:
         # Password input
         ttk.Label(self.login_frame, text="Password:").grid(row=1, column=0, pady=5)
         self.password_var = tk.StringVar()
-        ttk.Entry(self.login_frame, textvariable=self.password_var, show="*").grid(row=1, column=1, pady=5)
+        self.password_entry = ttk.Entry(self.login_frame, textvariable=self.password_var, show="*")
+        self.password_entry.grid(row=1, column=1, pady=5)
 
-        # ogin button
-        ttk.Button(self.login_frame, text="Login", command=self.login).grid(row=2, column=0, columnspan=2, pady=10)
+        # ogin button, usable once the database is open
+        state = tk.NORMAL if self.user_manager else tk.DISABLED
+        self.login_button = ttk.Button(self.login_frame, text="Login", command=self.login, state=state)
+        self.login_button.grid(row=2, column=0, columnspan=2, pady=10)
 
         # Register button for new users
-        ttk.Button(self.login_frame, text="Register", command=self.show_register).grid(row=3, column=0, columnspan=2)
+        self.register_button = ttk.Button(self.login_frame, text="Register", command=self.show_register, state=state)
+        self.register_button.grid(row=3, column=0, columnspan=2)
+
+        # staff with an open session come back without typing their password again
+        for i, username in enumerate(sorted(self.sessions), start=4):
+            ttk.Button(self.login_frame, text=f"Resume {username}",
+                       command=lambda username=username: self.resume(username)).grid(row=i, column=0, columnspan=2,
+                                                                                      pady=2)
+
+    def run_in_background(self, name, fn, on_done, *args):
+        # runs fn(*args) on the job runner and calls on_done(result, error) back on the Tk thread
+        job = self.jobs.submit(name, lambda job, *fn_args: fn(*fn_args), *args)
+        self.root.after(POLL_INTERVAL, self.poll_job, job, on_done)
+
+    def poll_job(self, job, on_done):
+        if not job.done():
+            self.root.after(POLL_INTERVAL, self.poll_job, job, on_done)
+            return
+        try:
+            result = job.result()
+        except Exception as e:
+            on_done(None, e)
+            return
+        on_done(result, None)
 
     def login(self):
 
         username = self.username_var.get()
         password = self.password_var.get()
-        user = self.user_manager.verify_user(username, password)
 
-        if user:
+        # no second attempt while the first one is still being checked
+        self.login_button.config(state=tk.DISABLED)
+        self.run_in_background('login', self.user_manager.login, self.login_finished, username, password)
+
+    def login_finished(self, session, error):
+
+        self.login_button.config(state=tk.NORMAL)
+        if error:
+            messagebox.showerror("Error", f"Login failed: {error}")
+        elif session:
             # Store the logged-in user
-            self.current_user = user
+            self.current_user, self.current_token = session
+            # a fresh login replaces a session the user left open earlier
+            stale = self.sessions.pop(self.current_user.username, None)
+            if stale:
+                self.user_manager.logout(stale)
             # Show the main menu after successful login
             self.show_main_menu()
         else:
             # Show an error message if login fails
             messagebox.showerror("Error", "Invalid username or password")
 
+    def resume(self, username):
+
+        # taking over an open session still needs its owner's password
+        password = self.password_var.get()
+        if not password:
+            self.username_var.set(username)
+            self.password_entry.focus_set()
+            messagebox.showinfo("Resume", f"Enter the password of {username} to resume their session")
+            return
+        self.run_in_background('resume', self.user_manager.resume,
+                               lambda principal, error: self.resume_finished(username, principal, error),
+                               self.sessions[username], password)
+
+    def resume_finished(self, username, principal, error):
+
+        # a second click finished after the first one already resumed
+        if self.current_user is not None:
+            return
+        if error or principal is False:
+            self.password_var.set("")
+            messagebox.showerror("Error", f"Could not resume: {error}" if error else "Invalid password")
+            return
+        token = self.sessions.pop(username, None)
+        if principal is None or token is None:
+            messagebox.showerror("Error", f"The session of {username} has expired, please log in again")
+            self.login_frame.destroy()
+            self.setup_login_frame()
+            return
+        self.current_user, self.current_token = principal, token
+        self.show_main_menu()
+
     def show_register(self):
 
         register_window = tk.Toplevel(self.root)
@@ -83,21 +192,25 @@ class MainWindow:
         email_var = tk.StringVar()
         ttk.Entry(register_window, textvariable=email_var).pack(pady=5)
 
+        def registered(user, error):
+
+            if error or user is None:
+                register_button.config(state=tk.NORMAL)
+                messagebox.showerror("Error", str(error) if error else "Could not register the user")
+                return
+            messagebox.showinfo("Success", "User registered successfully!")
+            register_window.destroy()  # Close the register window
+
         def register():
 
-            try:
-                self.user_manager.create_user(
-                    username_var.get(),
-                    password_var.get(),
-                    email_var.get()
-                )
-                messagebox.showinfo("Success", "User registered successfully!")
-                register_window.destroy()  # Close the register window
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            # hashing the new password runs in the background like a login
+            register_button.config(state=tk.DISABLED)
+            self.run_in_background('register', self.user_manager.create_user, registered,
+                                   username_var.get(), password_var.get(), email_var.get())
 
         # Register button
-        ttk.Button(register_window, text="Register", command=register).pack(pady=10)
+        register_button = ttk.Button(register_window, text="Register", command=register)
+        register_button.pack(pady=10)
 
     def show_main_menu(self):
 
@@ -117,6 +230,7 @@ class MainWindow:
             ("Manage Inventory", self.show_inventory),
             ("Record Sale", self.show_sales),
             ("View Reports", self.show_reports),
+            ("Switch User", self.switch_user),
             ("Logout", self.logout)
         ]
 
@@ -126,26 +240,51 @@ class MainWindow:
 
     def show_users(self):
 
-        UsersWindow(self.root, self.user_manager, self.current_user)
+        from presentation.users_window import UsersWindow
+        UsersWindow(self.root, self.user_manager, self.current_user, self.run_in_background)
 
     def show_inventory(self):
 
+        from presentation.inventory_window import InventoryWindow
         InventoryWindow(self.root, self.inventory_manager)
 
     def show_sales(self):
 
+        from presentation.sales_window import SalesWindow
         SalesWindow(self.root, self.sales_manager, self.inventory_manager, self.current_user)
 
     def show_reports(self):
 
+        from presentation.reports_window import ReportsWindow
         ReportsWindow(self.root, self.db, self.current_user)
 
+    def switch_user(self):
+
+        # keeps the session open so the user can resume it from the login screen
+        self.sessions[self.current_user.username] = self.current_token
+        self.current_user = None
+        self.current_token = None
+        self.menu_frame.destroy()
+        self.setup_login_frame()
+
     def logout(self):
 
+        self.user_manager.logout(self.current_token)
         self.current_user = None
+        self.current_token = None
         self.menu_frame.destroy()
         self.setup_login_frame()
 
+    def poll_sales(self):
+
+        # stock changes of sales the background writer has saved
+        self.sales_manager.publish_applied()
+        self.root.after(POLL_INTERVAL, self.poll_sales)
+
     def run(self):
 
         self.root.mainloop()
+        self.jobs.shutdown()
+        # closed before the database finished opening
+        if self.sales_manager:
+            self.sales_manager.close()
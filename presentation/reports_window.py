@@ -1,9 +1,21 @@
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime, timedelta
-import json
+from concurrent.futures import CancelledError
+from datetime import datetime
 
-from database.models import Sale, Inventory
+from business.report_engine import ReportEngine
+from business.report_formatter import ReportFormatter
+from business.job_runner import JobRunner, JobCancelled
+
+# how often the window checks on a running report (milliseconds)
+POLL_INTERVAL = 50
+
+# report chunks appended to the text widget per event loop tick
+CHUNKS_PER_TICK = 5
+
+# chunks a worker may run ahead of the widget
+CHUNK_QUEUE_SIZE = 20
 
 class ReportsWindow:
 
@@ -13,21 +25,24 @@ class ReportsWindow:
         self.window.geometry("800x600")
 
         self.db = db_handler
+        self.report_engine = ReportEngine(db_handler)
+        self.formatter = ReportFormatter(self.report_engine)
         self.current_user = current_user
 
+        # reports run on worker threads, only the latest job may write to the window
+        self.jobs = JobRunner(max_workers=2, name='report')
+        self.current_job = None
+        self.chunks = None
+        self.last_report_type = None
+
         self.setup_ui()
+        self.window.bind('<Destroy>', self.on_destroy)
 
     def setup_ui(self):
         self.report_frame = ttk.LabelFrame(self.window, text="Generate Report", padding="10")
         self.report_frame.pack(fill=tk.X, padx=5, pady=5)
 
-        report_types = [
-            "Daily Sales",
-            "Monthly Sales",
-            "Inventory Status",
-            "Low Stock Alert",
-            "Revenue Analysis"
-        ]
+        report_types = self.formatter.report_types()
 
         self.report_type = tk.StringVar(value=report_types[0])
 
@@ -36,6 +51,17 @@ class ReportsWindow:
 
         ttk.Button(self.report_frame, text="Generate Report", command=self.generate_report).pack(pady=10)
 
+        # progress indicator and cancel button for the running report
+        self.progress_frame = ttk.Frame(self.report_frame)
+        self.progress_frame.pack(fill=tk.X)
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.progress_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(self.progress_frame, text="Cancel", command=self.cancel_report,
+                                        state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        self.progress = ttk.Progressbar(self.progress_frame, mode='indeterminate')
+        self.progress.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+
         self.display_frame = ttk.LabelFrame(self.window, text="Report Results", padding="10")
         self.display_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
@@ -48,134 +74,112 @@ class ReportsWindow:
         report_type = self.report_type.get()
         self.report_text.delete(1.0, tk.END)  # Clear the previous report content
 
-        try:
-            if report_type == "Daily Sales":
-                self.generate_daily_sales_report()
-            elif report_type == "Monthly Sales":
-                self.generate_monthly_sales_report()
-            elif report_type == "Inventory Status":
-                self.generate_inventory_report()
-            elif report_type == "Low Stock Alert":
-                self.generate_low_stock_report()
-            elif report_type == "Revenue Analysis":
-                self.generate_revenue_analysis()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
-
-    def generate_daily_sales_report(self):
-
-        today = datetime.now().date()
-        sales = self.db.session.query(Sale).filter(Sale.date == today).all()
-
-        report = f"Daily Sales Report - {today}\n\n"
-        total_revenue = 0
-
-        for sale in sales:
-            report += f"Sale ID: {sale.sale_id}\n"
-            report += f"Time: {sale.date}\n"
-            report += f"Amount: GBP{sale.total_amount:.2f}\n"
-            report += "-" * 40 + "\n"
-            total_revenue += sale.total_amount
-
-        report += f"\nTotal Daily Revenue: GBP {total_revenue:.2f}"
-        self.report_text.insert(tk.END, report)
-
-    def generate_monthly_sales_report(self):
-
-        today = datetime.now().date()
-        first_day = today.replace(day=1)
-        sales = self.db.session.query(Sale).filter(Sale.date >= first_day).all()
-
-        report = f"Monthly Sales Report - {today.strftime('%B %Y')}\n\n"
-        total_revenue = 0
-        daily_totals = {}
-
-        for sale in sales:
-            date_str = sale.date.strftime('%Y-%m-%d')
-            daily_totals[date_str] = daily_totals.get(date_str, 0) + sale.total_amount
-            total_revenue += sale.total_amount
-
-        for date, amount in sorted(daily_totals.items()):
-            report += f"{date}: GBP {amount:.2f}\n"
-
-        report += f"\nTotal Monthly Revenue: GBP {total_revenue:.2f}"
-        self.report_text.insert(tk.END, report)
-
-    def generate_inventory_report(self):
-
-        inventory = self.db.session.query(Inventory).all()
-
-        report = "Current Inventory Status\n\n"
-        total_value = 0
-
-        for item in inventory:
-            value = item.quantity * item.cost
-            total_value += value
-            report += f"Item: {item.item_name}\n"
-            report += f"Quantity: {item.quantity}\n"
-            report += f"Unit Cost: GBP {item.cost:.2f}\n"
-            report += f"Total Value: GBP {value:.2f}\n"
-            report += "-" * 40 + "\n"
-
-        report += f"\nTotal Inventory Value: GBP {total_value:.2f}"
-        self.report_text.insert(tk.END, report)
-
-    def generate_low_stock_report(self):
-
-        LOW_STOCK_THRESHOLD = 10
-        low_stock = self.db.session.query(Inventory).filter(Inventory.quantity < LOW_STOCK_THRESHOLD).all()
-
-        report = "Low Stock Alert Report\n\n"
-
-        if not low_stock:
-            report += "No items are running low on stock."
-        else:
-            for item in low_stock:
-                report += f"Item: {item.item_name}\n"
-                report += f"Current Quantity: {item.quantity}\n"
-                report += f"Reorder Suggested: {LOW_STOCK_THRESHOLD - item.quantity} units\n"
-                report += "-" * 40 + "\n"
+        # a newer request replaces whatever is still running
+        if self.current_job:
+            self.current_job.cancel()
+
+        # bounded, so a slow widget holds back the worker instead of buffering the report
+        self.chunks = queue.Queue(maxsize=CHUNK_QUEUE_SIZE)
+        self.current_job = self.jobs.submit(report_type, self.stream_report, report_type, self.chunks)
+        self.last_report_type = report_type
+        self.start_progress(f"Generating {report_type}...")
+        self.window.after(POLL_INTERVAL, self.poll_report, self.current_job, self.chunks)
+
+    def stream_report(self, job, report_type, chunks):
+        # runs on a worker thread and must not touch any widget
+        for chunk in self.formatter.chunks(report_type):
+            while True:
+                job.check()
+                try:
+                    chunks.put(chunk, timeout=POLL_INTERVAL / 1000)
+                    break
+                except queue.Full:
+                    continue
+
+    def poll_report(self, job, chunks):
+        # results of a superseded job are dropped, they would overwrite the newer report
+        if job is not self.current_job:
+            return
 
-        self.report_text.insert(tk.END, report)
+        finished = job.done()
 
-    def generate_revenue_analysis(self):
+        # append a few chunks per event loop tick so the window stays responsive
+        for _ in range(CHUNKS_PER_TICK):
+            try:
+                self.report_text.insert(tk.END, chunks.get_nowait())
+            except queue.Empty:
+                break
 
-        today = datetime.now().date()
-        last_month = today - timedelta(days=30)
-        sales = self.db.session.query(Sale).filter(Sale.date >= last_month).all()
+        if not finished or not chunks.empty():
+            self.window.after(POLL_INTERVAL, self.poll_report, job, chunks)
+            return
 
-        report = "Revenue Analysis (Last 30 Days)\n\n"
+        self.current_job = None
+        self.stop_progress()
+        self.report_finished(job, "Report")
 
-        # Daily revenue breakdown
-        daily_revenue = {}
-        for sale in sales:
-            date_str = sale.date.strftime('%Y-%m-%d')
-            daily_revenue[date_str] = daily_revenue.get(date_str, 0) + sale.total_amount
+    def report_finished(self, job, what):
+        # shows how a finished job ended, returns True if it succeeded
+        try:
+            job.result()
+        except (JobCancelled, CancelledError):
+            self.status_var.set(f"{job.name} cancelled.")
+            return False
+        except Exception as e:
+            messagebox.showerror("Error", f"{what} failed: {str(e)}")
+            return False
+        return True
+
+    def start_progress(self, message):
+        self.status_var.set(message)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.progress.start(10)
+
+    def stop_progress(self):
+        self.status_var.set("")
+        self.progress.stop()
+        self.cancel_button.configure(state=tk.DISABLED)
+
+    def cancel_report(self):
+        if self.current_job:
+            self.current_job.cancel()
+
+    def on_destroy(self, event):
+        # the binding fires for every child widget, only act for the window itself
+        if event.widget is self.window:
+            if self.current_job:
+                self.current_job.cancel()
+            self.current_job = None
+            self.jobs.shutdown()
 
-        # Calculate statistics
-        total_revenue = sum(daily_revenue.values())
-        avg_daily_revenue = total_revenue / len(daily_revenue) if daily_revenue else 0
+    def export_report(self):
 
-        report += f"Total Revenue: GBP {total_revenue:.2f}\n"
-        report += f"Average Daily Revenue: GBP {avg_daily_revenue:.2f}\n\n"
-        report += "Daily Breakdown:\n"
+        if not self.last_report_type:
+            messagebox.showwarning("Warning", "No report to export")
+            return
 
-        for date, amount in sorted(daily_revenue.items()):
-            report += f"{date}: GBP {amount:.2f}\n"
+        # the report is streamed from the database straight into the file, not read
+        # back out of the text widget
+        if self.current_job:
+            self.current_job.cancel()
 
-        self.report_text.insert(tk.END, report)
+        filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        self.current_job = self.jobs.submit(self.last_report_type, self.write_report, self.last_report_type, filename)
+        self.start_progress(f"Exporting {self.last_report_type}...")
+        self.window.after(POLL_INTERVAL, self.poll_export, self.current_job, filename)
 
-    def export_report(self):
+    def write_report(self, job, report_type, filename):
+        with open(filename, 'w') as f:
+            self.formatter.write(report_type, f, check=job.check)
 
-        report_content = self.report_text.get(1.0, tk.END)
-        if not report_content.strip():
-            messagebox.showwarning("Warning", "No report to export")
+    def poll_export(self, job, filename):
+        if job is not self.current_job:
+            return
+        if not job.done():
+            self.window.after(POLL_INTERVAL, self.poll_export, job, filename)
             return
 
-        try:
-            filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            with open(filename, 'w') as f:
-                f.write(report_content)
+        self.current_job = None
+        self.stop_progress()
+        if self.report_finished(job, "Export"):
             messagebox.showinfo("Success", f"Report exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export report: {str(e)}")
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
+from presentation.virtual_tree import VirtualTreeview
 
 class SalesWindow:
     def __init__(self, parent, sales_manager, inventory_manager, current_user):
@@ -15,8 +16,8 @@ class SalesWindow:
         self.inventory_manager = inventory_manager
         self.current_user = current_user
 
-        # Initialize an empty cart
-        self.cart = []
+        # Initialize an empty cart, item_id -> (id, name, quantity, cost, total)
+        self.cart = {}
 
         # Set up the user interface components
         self.setup_ui()
@@ -24,6 +25,10 @@ class SalesWindow:
         # Load inventory items into the inventory list
         self.load_inventory()
 
+        # Stock changes (including this window's own sales) patch single rows
+        self.inventory_manager.events.subscribe(self.inventory_list.apply_change)
+        self.window.bind('<Destroy>', self.on_destroy)
+
     def setup_ui(self):
 
         # Left panel for displaying available items
@@ -43,20 +48,27 @@ class SalesWindow:
 
     def setup_inventory_list(self):
 
-        columns = ('ID', 'Name', 'Available', 'Cost')
-        self.inventory_tree = ttk.Treeview(self.inventory_frame, columns=columns, show='headings')
-
-        for col in columns:
-            self.inventory_tree.heading(col, text=col)
-            self.inventory_tree.column(col, width=100)
+        # type-ahead search box above the item list
+        search_frame = ttk.Frame(self.inventory_frame)
+        search_frame.grid(row=0, column=0, columnspan=3, sticky="ew", pady=5)
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', self.on_search)
+        ttk.Entry(search_frame, textvariable=self.search_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
 
-        self.inventory_tree.grid(row=0, column=0, columnspan=2, sticky="nsew")
+        columns = ('ID', 'Name', 'Available', 'Cost')
+        self.inventory_list = VirtualTreeview(
+            self.inventory_frame, columns, self.inventory_manager.iter_items,
+            format_row=lambda row: (row[0], row[1], row[2], f"GBP {row[3]:.2f}")
+        )
+        self.inventory_list.grid(row=1, column=0, columnspan=2)
+        self.inventory_tree = self.inventory_list.tree
 
         # Quantity entry field and Add to Cart button
-        ttk.Label(self.inventory_frame, text="Quantity:").grid(row=1, column=0, pady=5)
+        ttk.Label(self.inventory_frame, text="Quantity:").grid(row=2, column=0, pady=5)
         self.quantity_var = tk.StringVar(value="1")
-        ttk.Entry(self.inventory_frame, textvariable=self.quantity_var).grid(row=1, column=1, pady=5)
-        ttk.Button(self.inventory_frame, text="Add to Cart", command=self.add_to_cart).grid(row=2, column=0,
+        ttk.Entry(self.inventory_frame, textvariable=self.quantity_var).grid(row=2, column=1, pady=5)
+        ttk.Button(self.inventory_frame, text="Add to Cart", command=self.add_to_cart).grid(row=3, column=0,
                                                                                             columnspan=2, pady=5)
 
     def setup_cart_list(self):
@@ -88,12 +100,17 @@ class SalesWindow:
 
     def load_inventory(self):
 
-        for item in self.inventory_tree.get_children():
-            self.inventory_tree.delete(item)
+        self.inventory_list.reload()
+
+    def on_search(self, *args):
 
-        for item in self.inventory_manager.get_all_items():
-            self.inventory_tree.insert('', 'end',
-                                       values=(item.item_id, item.item_name, item.quantity, f"GBP {item.cost:.2f}"))
+        # an empty box goes back to the full paged list
+        query = self.search_var.get().strip()
+        if not query:
+            self.load_inventory()
+            return
+
+        self.inventory_list.show_rows(self.inventory_manager.search_items(query))
 
     def add_to_cart(self):
 
@@ -112,39 +129,57 @@ class SalesWindow:
             if quantity > available_quantity:  # Check if enough stock is available
                 raise ValueError("Not enough items in stock")
 
-            total = quantity * float(item[3].replace('GBP ', '').replace('gbp', ''))
-            self.cart.append((item[0], item[1], quantity, float(item[3].replace('GBP ', '').replace('gbp', '')), total))
-            self.update_cart_display()
+            # Adding the same item again grows its existing cart line
+            item_id = item[0]
+            cost = float(item[3].replace('GBP ', '').replace('gbp', ''))
+            if item_id in self.cart:
+                quantity += self.cart[item_id][2]
+                if quantity > available_quantity:
+                    raise ValueError("Not enough items in stock")
+
+            self.set_cart_line((item_id, item[1], quantity, cost, quantity * cost))
 
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
+    def set_cart_line(self, line):
+
+        # the cart tree uses the item_id as iid, so a line is changed in place
+        iid = str(line[0])
+        if line[0] in self.cart:
+            self.cart_tree.item(iid, values=line)
+        else:
+            self.cart_tree.insert('', 'end', iid=iid, values=line)
+        self.cart[line[0]] = line
+        self.update_total()
+
     def remove_from_cart(self):
 
         selected = self.cart_tree.selection()
         if not selected:
             return  # Do nothing if no item is selected
 
-        item_index = self.cart_tree.index(selected[0])
-        self.cart.pop(item_index)
-        self.update_cart_display()
+        for iid in selected:
+            self.cart.pop(int(iid), None)
+            self.cart_tree.delete(iid)
+        self.update_total()
 
     def clear_cart(self):
 
-        self.cart = []
-        self.update_cart_display()
+        self.cart = {}
+        self.cart_tree.delete(*self.cart_tree.get_children())
+        self.update_total()
 
-    def update_cart_display(self):
+    def update_total(self):
 
-        for item in self.cart_tree.get_children():
-            self.cart_tree.delete(item)
+        total = sum(line[4] for line in self.cart.values())
+        self.total_var.set(f"Total: GBP {total:.2f}")
 
-        total = 0
-        for item in self.cart:
-            self.cart_tree.insert('', 'end', values=item)
-            total += item[4]
+    def on_destroy(self, event):
 
-        self.total_var.set(f"Total: GBP {total:.2f}")
+        # the binding fires for every child widget, only act for the window itself
+        if event.widget is self.window:
+            self.inventory_manager.events.unsubscribe(self.inventory_list.apply_change)
 
     def complete_sale(self):
 
@@ -154,12 +189,11 @@ class SalesWindow:
 
         try:
             # Create the sale with item_id and quantity
-            items = [(item[0], item[2]) for item in self.cart]  # (item_id, quantity)
+            items = [(line[0], line[2]) for line in self.cart.values()]  # (item_id, quantity)
             self.sales_manager.create_sale(self.current_user.user_id, items)
             messagebox.showinfo("Success", "Sale completed successfully!")
 
-            # Clear the cart and reload the inventory
+            # Clear the cart, the sold items' stock is updated through the change events
             self.clear_cart()
-            self.load_inventory()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to complete sale: {str(e)}")
@@ -1,14 +1,23 @@
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
+from presentation.virtual_tree import VirtualTreeview
+
+# how often the window applies user changes made on other threads (milliseconds)
+POLL_INTERVAL = 50
 
 class UsersWindow:
-    def __init__(self, parent, user_manager, current_user):
+    def __init__(self, parent, user_manager, current_user, run_in_background):
         self.window = tk.Toplevel(parent)
         self.window.title("User Management")
         self.window.geometry("800x600")
 
         self.user_manager = user_manager
         self.current_user = current_user
+        # MainWindow.run_in_background, password hashing is slow on purpose so it runs off the Tk thread
+        self.run_in_background = run_in_background
+        # change events arrive on the thread that made the change, they are applied from here
+        self.changes = queue.Queue()
 
 
         self.list_frame = ttk.Frame(self.window, padding="10")
@@ -24,25 +33,21 @@ class UsersWindow:
         # Loads existing users
         self.load_users()
 
+        # Keep the list in step with the user manager's change events
+        self.user_manager.events.subscribe(self.on_change)
+        self.window.bind('<Destroy>', self.on_destroy)
+        self.window.after(POLL_INTERVAL, self.poll_changes)
+
     def setup_users_list(self):
         columns = ('ID', 'Username', 'Email')
-        self.tree = ttk.Treeview(self.list_frame, columns=columns, show='headings')
-
-        # Configure column headers and widths
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
-
-        self.tree.grid(row=0, column=0, sticky="nsew")
+        # Paged treeview with a vertical scrollbar, users are fetched as the list is scrolled
+        self.users_list = VirtualTreeview(self.list_frame, columns, self.user_manager.iter_users)
+        self.users_list.grid(row=0, column=0)
+        self.tree = self.users_list.tree
 
         # Bind the selection event to populate the user form when a user is selected
         self.tree.bind('<<TreeviewSelect>>', self.on_select)
 
-        # Add vertical scrollbar for the treeview
-        scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        self.tree.configure(yscrollcommand=scrollbar.set)
-
     def setup_user_form(self):
         """
         Set up the user form for adding or updating user details.
@@ -63,46 +68,49 @@ class UsersWindow:
         ttk.Entry(self.form_frame, textvariable=self.email_var).grid(row=2, column=1, pady=5)
 
         # Buttons for Add, Update, Delete actions
-        ttk.Button(self.form_frame, text="Add User", command=self.add_user).grid(row=3, column=0, pady=10)
-        ttk.Button(self.form_frame, text="Update User", command=self.update_user).grid(row=3, column=1, pady=10)
+        self.add_button = ttk.Button(self.form_frame, text="Add User", command=self.add_user)
+        self.add_button.grid(row=3, column=0, pady=10)
+        self.update_button = ttk.Button(self.form_frame, text="Update User", command=self.update_user)
+        self.update_button.grid(row=3, column=1, pady=10)
         ttk.Button(self.form_frame, text="Delete User", command=self.delete_user).grid(row=3, column=2, pady=10)
 
     def load_users(self):
         """
-        Loads the list of users into the treeview from the user manager.
+        Loads the first page of users into the treeview from the user manager.
         """
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        for user in self.user_manager.get_all_users():
-            # Insert each user's information into the treeview
-            self.tree.insert('', 'end', values=(user.user_id, user.username, user.email))
+        self.users_list.reload()
 
     def add_user(self):
         """
         Adds a new user to the system by getting details from the form and passing them to the user manager.
+        The password is hashed in the background, added_user reports the result.
         """
-        try:
-            username = self.username_var.get()
-            password = self.password_var.get()
-            email = self.email_var.get()
-
-            # Validate that all fields are filled in
-            if not all([username, password, email]):
-                raise ValueError("All fields are required")
+        username = self.username_var.get()
+        password = self.password_var.get()
+        email = self.email_var.get()
 
-            # Call the user manager to create the user
-            self.user_manager.create_user(username, password, email)
+        # Validate that all fields are filled in
+        if not all([username, password, email]):
+            messagebox.showerror("Error", "All fields are required")
+            return
 
-            # Reload the user list and clear the form
-            self.load_users()
-            self.clear_form()
+        self.add_button.config(state=tk.DISABLED)
+        self.run_in_background('add user', self.user_manager.create_user, self.added_user, username, password, email)
 
-            messagebox.showinfo("Success", "User added successfully!")
+    def added_user(self, user, error):
+        """
+        Called on the Tk thread once create_user has finished.
+        """
+        if not self.window.winfo_exists():
+            return
+        self.add_button.config(state=tk.NORMAL)
+        if error or user is None:
+            messagebox.showerror("Error", str(error) if error else "Could not add the user")
+            return
 
-        except Exception as e:
-            # Show an error message if something goes wrong
-            messagebox.showerror("Error", str(e))
+        # The new row arrives through the change event, just clear the form
+        self.clear_form()
+        messagebox.showinfo("Success", "User added successfully!")
 
     def update_user(self):
         """
@@ -113,24 +121,33 @@ class UsersWindow:
             messagebox.showwarning("Warning", "Please select a user to update")
             return
 
-        try:
-            user_id = self.tree.item(selected[0])['values'][0]
-            email = self.email_var.get()
-            password = self.password_var.get()
+        user_id = self.tree.item(selected[0])['values'][0]
+        email = self.email_var.get()
+        password = self.password_var.get()
 
-            # Only update the fields that are provided
+        def update():
+            # Only update the fields that are provided, a new password is hashed here off the Tk thread
+            updated = True
             if password:
-                self.user_manager.update_user_password(user_id, password)
+                updated = self.user_manager.update_user_password(user_id, password) and updated
             if email:
-                self.user_manager.update_user_email(user_id, email)
-
-            # Reload the user list to reflect the changes
-            self.load_users()
+                updated = self.user_manager.update_user_email(user_id, email) and updated
+            return updated
 
-            messagebox.showinfo("Success", "User updated successfully!")
+        self.update_button.config(state=tk.DISABLED)
+        self.run_in_background('update user', update, self.updated_user)
 
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+    def updated_user(self, updated, error):
+        """
+        Called on the Tk thread once update_user's changes have been saved.
+        """
+        if not self.window.winfo_exists():
+            return
+        self.update_button.config(state=tk.NORMAL)
+        if error or not updated:
+            messagebox.showerror("Error", str(error) if error else "Could not update the user")
+            return
+        messagebox.showinfo("Success", "User updated successfully!")
 
     def delete_user(self):
         """
@@ -153,8 +170,7 @@ class UsersWindow:
                 # Call the user manager to delete the selected user
                 self.user_manager.delete_user(user_id)
 
-                # Reload the user list and clear the form
-                self.load_users()
+                # The row is removed through the change event, just clear the form
                 self.clear_form()
 
                 messagebox.showinfo("Success", "User deleted successfully!")
@@ -162,6 +178,27 @@ class UsersWindow:
             except Exception as e:
                 messagebox.showerror("Error", str(e))
 
+    def on_change(self, event, payload):
+        """
+        Listener for the user manager's change events, which may come from a background job.
+        """
+        self.changes.put((event, payload))
+
+    def poll_changes(self):
+        """
+        Applies the queued user changes to the list on the Tk thread.
+        """
+        while not self.changes.empty():
+            self.users_list.apply_change(*self.changes.get_nowait())
+        self.window.after(POLL_INTERVAL, self.poll_changes)
+
+    def on_destroy(self, event):
+        """
+        Stops listening for user changes once the window is closed.
+        """
+        if event.widget is self.window:
+            self.user_manager.events.unsubscribe(self.on_change)
+
     def on_select(self, event):
         """
         Fills the user form with the details of the selected user from the list.
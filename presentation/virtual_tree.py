@@ -0,0 +1,174 @@
+from tkinter import ttk
+
+# rows fetched from the manager per page
+PAGE_SIZE = 100
+
+# fraction of the list scrolled through before the next page is fetched
+LOAD_AHEAD = 0.9
+
+# most pages held in the widget, the ones furthest from the view are dropped
+MAX_PAGES = 5
+
+class VirtualTreeview:
+    """
+    A Treeview with a scrollbar that loads its rows a page at a time.
+    fetch_page(after_key, limit) must return up to limit rows ordered by key, where the
+    key is the first value of each row. The widget holds at most max_pages pages around
+    the view: a page scrolled far out of sight is dropped and only the key it was fetched
+    after is kept, so it can be fetched again when the user scrolls back.
+    """
+
+    def __init__(self, parent, columns, fetch_page, page_size=PAGE_SIZE, format_row=None, max_pages=MAX_PAGES):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_pages = max(2, max_pages)
+        self.format_row = format_row or (lambda row: tuple(row))
+
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings')
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100)
+
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+        # loaded pages in order as [key fetched after, [iids], key of the last row], and the
+        # keys the pages dropped above them were fetched after, nearest last
+        self.pages = []
+        self.dropped = []
+        self.last_key = None
+        self.exhausted = False
+        self.loading = False
+        self.filtered = False
+
+    def grid(self, row, column, **options):
+        # the scrollbar goes in the column after the tree
+        span = options.get('columnspan', 1)
+        self.tree.grid(row=row, column=column, sticky="nsew", **options)
+        self.scrollbar.grid(row=row, column=column + span, sticky="ns")
+
+    def reload(self):
+        # drops every row and starts again from the first page
+        self.tree.delete(*self.tree.get_children())
+        self.pages = []
+        self.dropped = []
+        self.last_key = None
+        self.exhausted = False
+        self.filtered = False
+        self.load_more()
+
+    def show_rows(self, rows):
+        # replaces the paged list with a fixed set of rows, e.g. search results
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert('', 'end', iid=str(row[0]), values=self.format_row(row))
+        self.pages = []
+        self.dropped = []
+        self.last_key = None
+        self.exhausted = True
+        self.filtered = True
+
+    def _insert_page(self, after_key, rows, index):
+        iids = []
+        for offset, row in enumerate(rows):
+            iids.append(str(row[0]))
+            self.tree.insert('', index if index == 'end' else index + offset, iid=iids[-1],
+                             values=self.format_row(row))
+        return [after_key, iids, rows[-1][0] if rows else after_key]
+
+    def _keep_view(self, update):
+        # runs update, which adds or removes shift rows above the view, and scrolls
+        # so the rows the user was looking at stay where they were
+        total = len(self.tree.get_children())
+        top = self.tree.yview()[0] * total
+        shift = update()
+        total = len(self.tree.get_children())
+        if total:
+            self.tree.yview_moveto(max(0.0, top + shift) / total)
+
+    def load_more(self):
+        self.loading = False
+        if self.exhausted:
+            return
+
+        rows = self.fetch_page(self.last_key, self.page_size)
+        if rows:
+            self.pages.append(self._insert_page(self.last_key, rows, 'end'))
+            self.last_key = rows[-1][0]
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if len(self.pages) > self.max_pages:
+            self._keep_view(self._drop_first_page)
+
+    def _drop_first_page(self):
+        after_key, iids, _ = self.pages.pop(0)
+        self.dropped.append(after_key)
+        self.tree.delete(*iids)
+        return -len(iids)
+
+    def load_previous(self):
+        # fetches the nearest dropped page above the view again, dropping the last page
+        self.loading = False
+        if not self.dropped:
+            return
+
+        def update():
+            after_key = self.dropped.pop()
+            rows = self.fetch_page(after_key, self.page_size)
+            if self.pages:
+                # rows deleted meanwhile would let the page run on into the one below it
+                rows = [row for row in rows if row[0] <= self.pages[0][0]]
+            self.pages.insert(0, self._insert_page(after_key, rows, 0))
+            if len(self.pages) > self.max_pages:
+                _, iids, _ = self.pages.pop()
+                self.tree.delete(*iids)
+                self.last_key = self.pages[-1][2]
+                self.exhausted = False
+            return len(rows)
+
+        self._keep_view(update)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading:
+            return
+
+        # near the bottom (or the list does not fill the view yet), fetch the next page,
+        # near the top fetch a dropped page again, once the widget is idle rather than
+        # from inside its own redraw
+        if not self.exhausted and float(last) >= LOAD_AHEAD:
+            self.loading = True
+            self.tree.after_idle(self.load_more)
+        elif self.dropped and float(first) <= 1 - LOAD_AHEAD:
+            self.loading = True
+            self.tree.after_idle(self.load_previous)
+
+    def upsert_row(self, row):
+        # updates the row in place, a new row is only shown once its page is loaded
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.format_row(row))
+        elif self.exhausted and not self.filtered:
+            # keys grow, so a new row goes after everything already loaded
+            self.tree.insert('', 'end', iid=iid, values=self.format_row(row))
+            self.last_key = row[0] if self.last_key is None else max(self.last_key, row[0])
+            if not self.pages:
+                self.pages.append([None, [], None])
+            self.pages[-1][1].append(iid)
+            self.pages[-1][2] = self.last_key
+
+    def delete_row(self, key):
+        iid = str(key)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+            for _, iids, _ in self.pages:
+                if iid in iids:
+                    iids.remove(iid)
+                    break
+
+    def apply_change(self, event, payload):
+        # listener for a manager ChangeNotifier
+        if event == 'deleted':
+            self.delete_row(payload)
+        else:
+            self.upsert_row(payload)